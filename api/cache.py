@@ -0,0 +1,61 @@
+### Response cache for API endpoints ###
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def make_etag(key):
+    """Strong ETag for a cache key; the key includes the data version"""
+    return hashlib.sha1(repr(key).encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU cache of serialised response bodies
+
+    Bounded both by entry count and by the total size of the cached bodies;
+    the least recently used entries are evicted first.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, key, body):
+        # Never let a single response take over the whole cache
+        if len(body) > self.max_bytes // 4:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            self.entries[key] = body
+            self.size += len(body)
+
+            while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+# Shared cache for the players list endpoint
+players_cache = ResponseCache()
@@ -1,15 +1,62 @@
 ### Player routes ###
-from flask import jsonify, request
-from football import get_players
+from flask import current_app, jsonify, request, stream_with_context
+from player_queries import get_players, get_data_version, search_players, get_player_stats, decode_cursor
+from player_stats import DIMENSIONS
+from api.cache import players_cache, make_etag
+from api.serialize import dumps, envelope
+from export import EXPORT_FORMATS, export_players
+
+# Members shared by every successful players response, encoded once
+PLAYERS_ENVELOPE = envelope({
+    "result": True,
+    "status": "success",
+    "message": "Players retrieved successfully"
+})
+
+def cached_json(body, etag):
+    """JSON response from an already serialised body, revalidated by ETag"""
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def players_body(players, pagination):
+    """Response body for a page of players: only the rows and pagination are encoded per request"""
+    return b'{"data":' + dumps(players) + b',"pagination":' + dumps(pagination) + PLAYERS_ENVELOPE
+
+
+def not_modified(etag):
+    response = current_app.response_class(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 
 def get_players_list():
-    """API endpoint to get players with pagination and sorting"""
+    """
+    API endpoint to get players with pagination and sorting
+
+    Send `cursor` (empty for the first page) to page by keyset instead of
+    page number; every response then carries the nextCursor to follow.
+
+    Filters: position ("GK", or "FW,MF" for either), activeFrom and
+    activeTo (years the career must overlap), served from indexes.
+
+    Responses are cached per query and data version, and carry an ETag so
+    clients polling with If-None-Match get 304 Not Modified until the next
+    crawl writes.
+    """
     try:
         # Get query parameters with defaults
         page = request.args.get('page', default=1, type=int)
         page_size = request.args.get('pageSize', default=10, type=int)
         sort_column = request.args.get('sortColumn', default='id', type=str)
         sort_order = request.args.get('sortOrder', default='asc', type=str)
+        cursor = request.args.get('cursor', default=None, type=str)
+        position = request.args.get('position', default=None, type=str)
+        active_from = request.args.get('activeFrom', default=None, type=int)
+        active_to = request.args.get('activeTo', default=None, type=int)
         
         # Validate parameters
         if page < 1:
@@ -18,21 +65,52 @@ def get_players_list():
             page_size = 10
         if page_size > 100:  # Limit maximum page size
             page_size = 100
+        try:
+            decode_cursor(cursor)
+        except ValueError:
+            return jsonify({
+                "result": False,
+                "status": "error",
+                "message": "Invalid 'cursor': pass the nextCursor of a previous page, or an empty cursor to start"
+            }), 400
+
+        # Answer from the cache while the data version is unchanged
+        cache_key = (page, page_size, sort_column, sort_order, cursor, position, active_from, active_to,
+                     get_data_version())
+        etag = make_etag(cache_key)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+
+        body = players_cache.get(cache_key)
+        if body is not None:
+            return cached_json(body, etag)
             
-        # Get paginated players directly from database
-        result, total_records = get_players(
-            page=page, 
-            page_size=page_size, 
-            sort_column=sort_column, 
-            sort_order=sort_order
-        )
+        # Get paginated players directly from database, as dicts ready for the encoder
+        next_cursor = None
+        if cursor is None:
+            players_list, total_records = get_players(
+                page=page, 
+                page_size=page_size, 
+                sort_column=sort_column, 
+                sort_order=sort_order,
+                position=position,
+                active_from=active_from,
+                active_to=active_to
+            )
+        else:
+            players_list, total_records, next_cursor = get_players(
+                page_size=page_size, 
+                sort_column=sort_column, 
+                sort_order=sort_order,
+                cursor=cursor,
+                position=position,
+                active_from=active_from,
+                active_to=active_to
+            )
         
         # Calculate total pages
         total_pages = (total_records + page_size - 1) // page_size  # Ceiling division
         
-        # Convert DataFrame to a list of dictionaries for JSON serialization
-        players_list = result.to_dict(orient='records')
-        
         # Prepare pagination metadata
         pagination = {
             "page": page,
@@ -42,17 +120,159 @@ def get_players_list():
             "sortColumn": sort_column,
             "sortOrder": sort_order
         }
+        if position:
+            pagination["position"] = position
+        if active_from is not None:
+            pagination["activeFrom"] = active_from
+        if active_to is not None:
+            pagination["activeTo"] = active_to
+        if cursor is not None:
+            pagination["cursor"] = cursor
+            pagination["nextCursor"] = next_cursor
         
-        return jsonify({ 
-            "result": True, 
-            "data": players_list,
-            "pagination": pagination,
-            "status": "success", 
-            "message": "Players retrieved successfully"
+        body = players_body(players_list, pagination)
+        players_cache.set(cache_key, body)
+        return cached_json(body, etag)
+    except Exception as e:
+        return jsonify({
+            "result": False,
+            "status": "error", 
+            "message": str(e)
+        }), 500
+
+
+def search_players_list():
+    """API endpoint to search players by name, position or info, ranked by relevance"""
+    try:
+        # Get query parameters with defaults
+        query = request.args.get('q', default='', type=str).strip()
+        page = request.args.get('page', default=1, type=int)
+        page_size = request.args.get('pageSize', default=10, type=int)
+
+        # Validate parameters
+        if not query:
+            return jsonify({
+                "result": False,
+                "status": "error",
+                "message": "Query parameter 'q' is required"
+            }), 400
+        if page < 1:
+            page = 1
+        if page_size < 1:
+            page_size = 10
+        if page_size > 100:  # Limit maximum page size
+            page_size = 100
+
+        # Answer from the cache while the data version is unchanged
+        cache_key = ('search', query, page, page_size, get_data_version())
+        etag = make_etag(cache_key)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+
+        body = players_cache.get(cache_key)
+        if body is not None:
+            return cached_json(body, etag)
+
+        players_list, total_records = search_players(query, page=page, page_size=page_size)
+
+        # Calculate total pages
+        total_pages = (total_records + page_size - 1) // page_size  # Ceiling division
+
+        body = players_body(players_list, {
+            "q": query,
+            "page": page,
+            "pageSize": page_size,
+            "totalRecords": total_records,
+            "totalPages": total_pages
         })
+        players_cache.set(cache_key, body)
+        return cached_json(body, etag)
+    except Exception as e:
+        return jsonify({
+            "result": False,
+            "status": "error", 
+            "message": str(e)
+        }), 500
+
+
+def get_players_stats():
+    """
+    API endpoint returning player counts per position, letter and career decade
+
+    Send `dimension` to get only one of them. Counts come from the
+    player_stats summary table, so this is as cheap as a page of players.
+    """
+    try:
+        dimension = request.args.get('dimension', default=None, type=str)
+        if dimension is not None and dimension not in DIMENSIONS:
+            return jsonify({
+                "result": False,
+                "status": "error",
+                "message": f"dimension must be one of: {', '.join(DIMENSIONS)}"
+            }), 400
+
+        # Answer from the cache while the data version is unchanged
+        cache_key = ('stats', dimension, get_data_version())
+        etag = make_etag(cache_key)
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+
+        body = players_cache.get(cache_key)
+        if body is None:
+            body = dumps({
+                "data": get_player_stats(dimension),
+                "result": True,
+                "status": "success",
+                "message": "Player stats retrieved successfully"
+            })
+            players_cache.set(cache_key, body)
+        return cached_json(body, etag)
+    except Exception as e:
+        return jsonify({
+            "result": False,
+            "status": "error", 
+            "message": str(e)
+        }), 500
+
+
+def export_players_list():
+    """
+    API endpoint streaming the whole players table, or a filtered part of it
+
+    Query parameters: format (ndjson or csv), gzip (1 to send it with
+    Content-Encoding: gzip), letter, position, nationality, updatedSince,
+    afterId and limit. Rows are read and sent a chunk at a time, so a full
+    dump runs in constant memory.
+    """
+    try:
+        fmt = request.args.get('format', default='ndjson', type=str).lower()
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({
+                "result": False,
+                "status": "error",
+                "message": f"format must be one of: {', '.join(sorted(EXPORT_FORMATS))}"
+            }), 400
+
+        compress = request.args.get('gzip', default=0, type=int) == 1
+        filters = {
+            'letter': request.args.get('letter', type=str),
+            'position': request.args.get('position', type=str),
+            'nationality': request.args.get('nationality', type=str),
+            'updated_since': request.args.get('updatedSince', type=str),
+            'after_id': request.args.get('afterId', type=int),
+            'limit': request.args.get('limit', type=int)
+        }
+
+        stream = export_players(fmt, compress, **filters)
+        response = current_app.response_class(stream_with_context(stream), mimetype=EXPORT_FORMATS[fmt])
+        response.headers['Content-Disposition'] = f'attachment; filename="players.{fmt}"'
+        response.headers['X-Data-Version'] = str(get_data_version())
+        if compress:
+            response.headers['Content-Encoding'] = 'gzip'
+        return response
     except Exception as e:
         return jsonify({
             "result": False,
             "status": "error", 
             "message": str(e)
-        }), 500
\ No newline at end of file
+        }), 500
@@ -0,0 +1,31 @@
+### JSON encoding for API responses ###
+import json
+
+# orjson is optional: several times faster than json and returns bytes directly
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj):
+    """
+    Serialise obj to compact UTF-8 JSON bytes
+
+    Uses orjson when it is installed, the standard json module otherwise;
+    both produce the same document.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def envelope(fields):
+    """
+    Pre-serialise the constant members of a response object
+
+    Returns the bytes to put after the variable members, so a body is just
+    b'{"data":' + dumps(data) + ... + envelope(...) with no re-encoding of
+    the constant part per request.
+    """
+    return b''.join(b',' + dumps(key) + b':' + dumps(value) for key, value in fields.items()) + b'}'
@@ -0,0 +1,133 @@
+### fbref page fixtures for offline benchmarks ###
+import gzip
+import os
+import random
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Rows per letter page as logged by the 2025-05-19 crawl: a small, a typical
+# and the large pages ("Ab" took 22 s, "Ma" is the largest on the site)
+LETTER_ROWS = {
+    'Aa': 83,
+    'Ab': 1119,
+    'Ac': 334,
+    'Ad': 685,
+    'Ba': 4846,
+    'Ma': 8348,
+}
+
+POSITIONS = ["GK", "DF", "MF", "FW", "DF-MF", "MF-FW", "FW-MF", "DF-FW"]
+CLUBS = ["Arsenal", "Barcelona", "Bayern Munich", "Juventus", "Paris S-G", "Ajax", "Benfica", "Celtic"]
+SYLLABLES = ["ra", "mo", "li", "an", "dre", "sa", "ko", "vi", "el", "to", "ni", "ber", "gu", "sta", "fa"]
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURE_DIR, f"{name}.html.gz")
+
+
+def page_chrome(rng):
+    """Header, navigation and footer markup around the content, sized like fbref's"""
+    nav = ''.join(
+        f'<li><a href="/en/comps/{i}/">{rng.choice(CLUBS)} league {i}</a></li>' for i in range(400)
+    )
+    script = '<script>var sr_data = {' + ','.join(f'"k{i}": {i}' for i in range(2000)) + '};</script>'
+    header = (f'<!DOCTYPE html><html><head><title>Players | FBref.com</title>{script}</head><body>'
+              f'<div id="header"><ul class="nav">{nav}</ul></div><div id="wrap"><div id="content">')
+    footer = f'</div></div><div id="footer"><ul>{nav}</ul></div></body></html>'
+    return header, footer
+
+
+def player_name(rng, letter):
+    first = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))).capitalize()
+    last = letter + ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+    return f"{first} {last}"
+
+
+def letter_page(letter, rows=None):
+    """
+    Synthetic letter page in fbref's markup
+
+    Every player is a `.section_content p` of "Name · Years · Position"
+    with an optional club, like the live pages.
+
+    Args:
+        letter (str): Letter code, e.g. 'Ab'
+        rows (int): Players on the page (default: LETTER_ROWS, else 300)
+
+    Returns:
+        str: Page source
+    """
+    rng = random.Random(letter)
+    rows = rows if rows is not None else LETTER_ROWS.get(letter, 300)
+    header, footer = page_chrome(rng)
+
+    paragraphs = []
+    for i in range(rows):
+        name = player_name(rng, letter)
+        first_year = rng.randint(1950, 2024)
+        last_year = min(2025, first_year + rng.randint(0, 20))
+        player_id = f"{rng.getrandbits(32):08x}"
+        parts = [
+            f'<strong><a href="/en/players/{player_id}/{name.replace(" ", "-")}">{name}</a></strong>',
+            f'{first_year}-{last_year}',
+            rng.choice(POSITIONS)
+        ]
+        if rng.random() < 0.7:
+            parts.append(f'<a href="/en/squads/{i:08x}/">{rng.choice(CLUBS)}</a>')
+        paragraphs.append('<p>' + ' · '.join(parts) + '</p>')
+
+    content = (f'<h1>Players: {letter}</h1><div class="section_wrapper"><div class="section_content" '
+               f'id="div_{letter.lower()}">' + ''.join(paragraphs) + '</div></div>')
+    return header + content + footer
+
+
+def index_page(letters=None, base_url=""):
+    """Synthetic players index page linking every letter code"""
+    rng = random.Random("index")
+    letters = letters or [a + b for a in "ABCDEFGHIJKLMNOPQRSTUVWXYZ" for b in "abcdefghijklmnopqrstuvwxyz"]
+    header, footer = page_chrome(rng)
+    links = ''.join(f'<li><a href="{base_url}/en/players/{letter.lower()}/">{letter}</a></li>' for letter in letters)
+    return header + f'<div class="section_content"><ul class="page_index">{links}</ul></div>' + footer
+
+
+def load_fixture(name):
+    """
+    Page source for a fixture: the recorded page if there is one, else synthetic
+
+    Args:
+        name (str): 'index' or a letter code
+
+    Returns:
+        str: Page source
+    """
+    path = fixture_path(name)
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8')
+    return index_page() if name == 'index' else letter_page(name)
+
+
+def record_fixtures(letters=None):
+    """
+    Save live fbref pages as fixtures (needs network access; be polite, run rarely)
+
+    Args:
+        letters (list): Letter codes to record (default: LETTER_ROWS)
+    """
+    from services.fetcher import get_fetcher, BASE_URL
+    from services.rate_limit import HostLimiter, call_with_retries
+
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    fetcher = get_fetcher('http')
+    limiter = HostLimiter()
+    pages = {'index': f"{BASE_URL}/en/players/"}
+    pages.update({letter: f"{BASE_URL}/en/players/{letter.lower()}/" for letter in letters or LETTER_ROWS})
+
+    try:
+        for name, url in pages.items():
+            html = call_with_retries(limiter, url, lambda: fetcher.get(url))
+            with open(fixture_path(name), 'wb') as f:
+                f.write(gzip.compress(html.encode('utf-8')))
+            print(f"Recorded {name}: {len(html)} bytes")
+    finally:
+        fetcher.close()
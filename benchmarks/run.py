@@ -0,0 +1,394 @@
+### Offline benchmark suite: parse, crawl, DB insert and read latency ###
+#
+# Usage (from the repository root):
+#   python -m benchmarks.run                        # everything, results in benchmarks/results/
+#   python -m benchmarks.run --only parse,read --compare benchmarks/results/<earlier>.json
+#   python -m benchmarks.run --record               # refresh the recorded fixtures from fbref.com
+import argparse
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Crawl side effects (logs, metrics file, page cache, players snapshot) go to a scratch directory
+WORK_DIR = tempfile.mkdtemp(prefix="football-bench-")
+os.environ.setdefault("LOG_DIR", os.path.join(WORK_DIR, "log"))
+os.environ.setdefault("METRICS_DIR", os.path.join(WORK_DIR, "metrics"))
+os.environ.setdefault("HTTP_CACHE_DIR", os.path.join(WORK_DIR, "cache"))
+os.environ.setdefault("SNAPSHOT_DIR", os.path.join(WORK_DIR, "snapshot"))
+
+import football
+import player_queries
+from db import writer_connection, get_read_pool
+from services.fetcher import parse_player_codes, parse_player_rows
+from benchmarks.fixtures import LETTER_ROWS, load_fixture, record_fixtures
+from benchmarks.server import StandInServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BENCH_SECTIONS = ("import", "parse", "db", "crawl", "read")
+
+# Modules an API worker or the crawler loads at startup, and the heavy
+# dependencies whose presence in sys.modules is reported for each
+IMPORT_MODULES = ("player_queries", "api.controllers.player", "main", "football")
+HEAVY_MODULES = ("pandas", "numpy", "bs4", "lxml", "requests", "selenium", "webdriver_manager")
+
+
+def percentile(values, p):
+    """p-th percentile (nearest rank) of a list of numbers"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize_ms(seconds):
+    """p50/p99/mean/max of a list of durations, in milliseconds"""
+    return {
+        'p50_ms': round(percentile(seconds, 50) * 1000, 3),
+        'p99_ms': round(percentile(seconds, 99) * 1000, 3),
+        'mean_ms': round(sum(seconds) / len(seconds) * 1000, 3),
+        'max_ms': round(max(seconds) * 1000, 3),
+        'samples': len(seconds)
+    }
+
+
+def crawl_letters(count):
+    """The fixture letters first (large pages included), then synthetic ones up to count"""
+    letters = list(LETTER_ROWS)
+    extra = (a + b for a in "CDEFGHIJKL" for b in "abcdefghijklmnopqrstuvwxyz")
+    while len(letters) < count:
+        letter = next(extra)
+        if letter not in letters:
+            letters.append(letter)
+    return letters[:count]
+
+
+def create_database(path, letters, base_url="http://127.0.0.1"):
+    """Fresh database with player_codes for letters and an empty players table"""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+    conn = writer_connection(path)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS player_codes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        letter TEXT NOT NULL,
+        url TEXT NOT NULL,
+        status BOOLEAN DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    conn.executemany("INSERT INTO player_codes (letter, url) VALUES (?, ?)",
+                     [(letter, f"{base_url}/en/players/{letter.lower()}/") for letter in letters])
+    football.create_players_table(conn)
+    football.create_data_meta(conn.cursor())
+    conn.commit()
+    return conn
+
+
+def bench_import(repeat=5):
+    """Cold import time and peak memory of each startup module, in a fresh interpreter per sample"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = {}
+    for module in IMPORT_MODULES:
+        code = (
+            "import json, resource, sys, time\n"
+            "started = time.perf_counter()\n"
+            f"import {module}\n"
+            "seconds = time.perf_counter() - started\n"
+            # Peak RSS of this process; ru_maxrss would include the parent's from before exec on Linux
+            "try:\n"
+            "    peak = int([l for l in open('/proc/self/status') if l.startswith('VmHWM')][0].split()[1])\n"
+            "except OSError:\n"
+            "    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+            "print(json.dumps([seconds, peak, [name for name in "
+            f"{HEAVY_MODULES!r} if name in sys.modules]]))\n"
+        )
+        samples = []
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True)
+            samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+        seconds = [sample[0] for sample in samples]
+        results[module] = {
+            'median_ms': round(percentile(seconds, 50) * 1000, 1),
+            'best_ms': round(min(seconds) * 1000, 1),
+            'max_rss_mb': round(max(sample[1] for sample in samples) / 1024, 1),
+            'heavy_modules': samples[-1][2]
+        }
+        print(f"  import {module:<24} {results[module]['median_ms']:>7.1f} ms  {results[module]['max_rss_mb']:>6.1f} MB  "
+              f"{', '.join(results[module]['heavy_modules']) or '-'}")
+    return results
+
+
+def bench_parse(repeat=5):
+    """Parse time of the index page and every fixture letter page"""
+    results = {}
+    for name in ['index'] + list(LETTER_ROWS):
+        html = load_fixture(name)
+        parse = parse_player_codes if name == 'index' else parse_player_rows
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            rows = parse(html)
+            timings.append(time.perf_counter() - started)
+
+        best = min(timings)
+        results[name] = {
+            'bytes': len(html.encode('utf-8')),
+            'rows': len(rows),
+            'best_ms': round(best * 1000, 2),
+            'median_ms': round(percentile(timings, 50) * 1000, 2),
+            'rows_per_s': round(len(rows) / best, 1),
+            'mb_per_s': round(len(html.encode('utf-8')) / best / 1e6, 2)
+        }
+        print(f"  parse {name:<6} {results[name]['rows']:>6} rows  {results[name]['median_ms']:>8.1f} ms  "
+              f"{results[name]['rows_per_s']:>9.0f} rows/s")
+    return results
+
+
+def bench_db_insert(path):
+    """Rows/s of save_letter_players for new rows, unchanged rows and changed rows"""
+    letters = list(LETTER_ROWS)
+    pages = {letter: parse_player_rows(load_fixture(letter)) for letter in letters}
+    total = sum(len(rows) for rows in pages.values())
+
+    conn = create_database(path, letters)
+    cursor = conn.cursor()
+    ids = dict(cursor.execute("SELECT letter, id FROM player_codes").fetchall())
+
+    def save_all(label):
+        started = time.perf_counter()
+        written = 0
+        for letter, rows in pages.items():
+            inserted, updated = football.save_letter_players(cursor, ids[letter], rows)
+            conn.commit()
+            written += inserted + updated
+        seconds = time.perf_counter() - started
+        print(f"  db {label:<9} {total:>6} rows  {seconds:>7.3f} s  {total / seconds:>9.0f} rows/s  ({written} written)")
+        return {'rows': total, 'written': written, 'seconds': round(seconds, 4),
+                'rows_per_s': round(total / seconds, 1)}
+
+    try:
+        results = {'insert': save_all('insert'), 'unchanged': save_all('unchanged')}
+        for rows in pages.values():
+            for row in rows:
+                row['additional_info'] = (row['additional_info'] + ' *').strip()
+        results['update'] = save_all('update')
+        return results
+    finally:
+        conn.close()
+
+
+def bench_crawl(path, concurrency_levels, letters, latency, jitter, failure_rate, throttle_rate):
+    """End-to-end load_player against the stand-in server at each concurrency level"""
+    results = []
+    with StandInServer(latency, jitter, failure_rate, throttle_rate) as server:
+        for workers in concurrency_levels:
+            create_database(path, letters, server.base_url).close()
+            football.db_link = path
+            requests_before, failures_before = server.requests, server.failures
+
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                ok = football.load_player('http', workers=workers, rate=1000.0, cache_mode='off',
+                                          limit=len(letters))
+            seconds = time.perf_counter() - started
+
+            conn = sqlite3.connect(path)
+            rows = conn.execute("SELECT COUNT(*) FROM players").fetchone()[0]
+            done = conn.execute("SELECT COUNT(*) FROM player_codes WHERE status = 1").fetchone()[0]
+            phases = conn.execute("""
+                SELECT fetch_seconds, parse_seconds, db_seconds, retries, bytes
+                FROM crawl_runs ORDER BY id DESC LIMIT 1
+            """).fetchone()
+            conn.close()
+
+            result = {
+                'workers': workers,
+                'ok': ok,
+                'seconds': round(seconds, 3),
+                'letters_done': done,
+                'rows': rows,
+                'pages_per_s': round(done / seconds, 2),
+                'rows_per_s': round(rows / seconds, 1),
+                'requests': server.requests - requests_before,
+                'injected_failures': server.failures - failures_before,
+                'fetch_seconds': round(phases[0], 3),
+                'parse_seconds': round(phases[1], 3),
+                'db_seconds': round(phases[2], 3),
+                'retries': phases[3],
+                'bytes': phases[4]
+            }
+            results.append(result)
+            print(f"  crawl {workers:>2} worker(s)  {seconds:>7.2f} s  {done}/{len(letters)} letters  "
+                  f"{result['rows_per_s']:>8.0f} rows/s  {result['retries']} retries")
+    return results
+
+
+def bench_get_players(path, players, samples, page_size=10):
+    """get_players / search_players latency percentiles on a table of `players` rows"""
+    base_rows = [row for letter in LETTER_ROWS for row in parse_player_rows(load_fixture(letter))]
+    chunks = math.ceil(players / len(base_rows))
+    conn = create_database(path, [f"R{i}" for i in range(chunks)])
+    cursor = conn.cursor()
+
+    # Copies of the fixture rows with distinct urls, one player_code per copy
+    remaining = players
+    for chunk in range(chunks):
+        rows = [dict(row, url=f"{row['url']}#{chunk}") for row in base_rows[:remaining]]
+        football.save_letter_players(cursor, chunk + 1, rows)
+        conn.commit()
+        remaining -= len(rows)
+    conn.execute("ANALYZE")
+    sample_rows = conn.execute("SELECT name, id FROM players ORDER BY RANDOM() LIMIT ?", (samples,)).fetchall()
+    conn.close()
+
+    player_queries.db_link = path
+    get_read_pool(path)
+
+    # The endpoint as a worker runs it, response cache cleared so every call does the full work
+    from flask import Flask
+    from api.cache import players_cache
+    from api.controllers.player import get_players_list
+    app = Flask(__name__)
+
+    def get_list(url):
+        players_cache.clear()
+        with app.test_request_context(url):
+            return get_players_list()
+
+    rng = random.Random(0)
+    pages = max(1, players // page_size)
+    scenarios = {
+        'first_page': lambda i: player_queries.get_players(1, page_size),
+        'random_offset_page': lambda i: player_queries.get_players(rng.randint(1, pages), page_size),
+        'deep_offset_page': lambda i: player_queries.get_players(pages - rng.randint(0, 10), page_size),
+        'sort_name_desc': lambda i: player_queries.get_players(rng.randint(1, pages), page_size, 'name', 'desc'),
+        'keyset_name': lambda i: player_queries.get_players(
+            page_size=page_size, sort_column='name',
+            cursor=player_queries.encode_cursor(sample_rows[i % len(sample_rows)][0], sample_rows[i % len(sample_rows)][1])),
+        'search': lambda i: player_queries.search_players(rng.choice(["ra", "mo", "li", "sta", "Ab"]), 1, page_size),
+        'api_get_list': lambda i: get_list(f"/api/players/get-list?page={rng.randint(1, pages)}&pageSize={page_size}"),
+    }
+
+    results = {'players': players}
+    for name, query in scenarios.items():
+        timings = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            query(0)  # warm the pool and the page cache
+            for i in range(samples):
+                started = time.perf_counter()
+                query(i)
+                timings.append(time.perf_counter() - started)
+        results[name] = summarize_ms(timings)
+        print(f"  read {name:<19} p50 {results[name]['p50_ms']:>8.2f} ms  p99 {results[name]['p99_ms']:>8.2f} ms")
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(previous, current):
+    """Print the change of the headline numbers between two result files"""
+    def headline(results):
+        values = {}
+        for module, run in results.get('import', {}).items():
+            values[f'import {module} ms'] = run['median_ms']
+        for name, page in results.get('parse', {}).items():
+            values[f'parse {name} ms'] = page['median_ms']
+        for label, run in results.get('db', {}).items():
+            values[f'db {label} rows/s'] = run['rows_per_s']
+        for run in results.get('crawl', []):
+            values[f"crawl {run['workers']}w s"] = run['seconds']
+        for name, stats in results.get('read', {}).items():
+            if isinstance(stats, dict):
+                values[f'read {name} p99 ms'] = stats['p99_ms']
+        return values
+
+    old, new = headline(previous['results']), headline(current['results'])
+    print(f"\nCompared with {previous.get('git_commit')} ({previous.get('started_at')}):")
+    for key in new:
+        if key in old and old[key]:
+            print(f"  {key:<32} {old[key]:>12.2f} -> {new[key]:>12.2f}  ({(new[key] - old[key]) / old[key]:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the crawler and the read API")
+    parser.add_argument('--only', default=','.join(BENCH_SECTIONS), help="Comma-separated: import,parse,db,crawl,read")
+    parser.add_argument('--repeat', type=int, default=5, help="Import samples per module and parse repetitions per page")
+    parser.add_argument('--concurrency', default="1,2,4,8", help="Crawl worker counts")
+    parser.add_argument('--crawl-letters', type=int, default=24, help="Letter pages per crawl")
+    parser.add_argument('--latency', type=float, default=0.05, help="Stand-in server latency (s)")
+    parser.add_argument('--jitter', type=float, default=0.02, help="Extra random latency (s)")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Share of requests answered 500")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Share of requests answered 429")
+    parser.add_argument('--players', type=int, default=100000, help="Rows in the read benchmark table")
+    parser.add_argument('--samples', type=int, default=200, help="Queries per read scenario")
+    parser.add_argument('--output', help="Result file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', help="Earlier result file to compare with")
+    parser.add_argument('--record', action='store_true', help="Record fixtures from fbref.com and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixtures()
+        return
+
+    sections = [section.strip() for section in args.only.split(',') if section.strip()]
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'record')}
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': git_commit(),
+        'python': sys.version.split()[0],
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'config': config,
+        'results': {}
+    }
+    db_path = os.path.join(WORK_DIR, "bench.db")
+
+    if 'import' in sections:
+        print("Import time")
+        report['results']['import'] = bench_import(args.repeat)
+    if 'parse' in sections:
+        print("Parse throughput")
+        report['results']['parse'] = bench_parse(args.repeat)
+    if 'db' in sections:
+        print("DB insert")
+        report['results']['db'] = bench_db_insert(db_path)
+    if 'crawl' in sections:
+        print("End-to-end crawl")
+        levels = [int(level) for level in args.concurrency.split(',')]
+        report['results']['crawl'] = bench_crawl(db_path, levels, crawl_letters(args.crawl_letters), args.latency,
+                                                 args.jitter, args.failure_rate, args.throttle_rate)
+    if 'read' in sections:
+        print("Read latency")
+        report['results']['read'] = bench_get_players(os.path.join(WORK_DIR, "read.db"), args.players, args.samples)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
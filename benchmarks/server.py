@@ -0,0 +1,132 @@
+### Local stand-in for fbref.com used by the benchmarks ###
+import hashlib
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from benchmarks.fixtures import load_fixture
+
+
+class StandInServer:
+    """
+    Serves fixture pages at fbref's paths on 127.0.0.1
+
+    /en/players/ is the index page and /en/players/<code>/ a letter page.
+    Every response waits `latency` seconds (plus up to `jitter`); a share of
+    requests fail with 500 (`failure_rate`) or are throttled with 429 and
+    Retry-After (`throttle_rate`). ETag/If-None-Match is answered with 304
+    like the live site.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, throttle_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.pages = {}
+        self.requests = 0
+        self.failures = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server.handle(self)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="stand-in-server", daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def letter_url(self, letter):
+        return f"{self.base_url}/en/players/{letter.lower()}/"
+
+    def page(self, name):
+        """Fixture body and ETag, loaded once per name"""
+        with self.lock:
+            if name not in self.pages:
+                body = load_fixture(name).encode('utf-8')
+                self.pages[name] = (body, '"' + hashlib.md5(body).hexdigest() + '"')
+            return self.pages[name]
+
+    def handle(self, request):
+        with self.lock:
+            self.requests += 1
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            roll = self.random.random()
+        if delay:
+            time.sleep(delay)
+
+        if roll < self.failure_rate + self.throttle_rate:
+            with self.lock:
+                self.failures += 1
+            throttled = roll < self.throttle_rate
+            request.send_response(429 if throttled else 500)
+            if throttled:
+                request.send_header('Retry-After', '1')
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+            return
+
+        parts = [part for part in request.path.split('?')[0].split('/') if part]
+        if parts[:2] != ['en', 'players'] or len(parts) > 3:
+            request.send_response(404)
+            request.send_header('Content-Length', '0')
+            request.end_headers()
+            return
+
+        name = parts[2].capitalize() if len(parts) == 3 else 'index'
+        body, etag = self.page(name)
+        if request.headers.get('If-None-Match') == etag:
+            request.send_response(304)
+            request.end_headers()
+            return
+
+        request.send_response(200)
+        request.send_header('Content-Type', 'text/html; charset=utf-8')
+        request.send_header('ETag', etag)
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve fbref fixtures locally")
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--jitter', type=float, default=0.1)
+    parser.add_argument('--failure-rate', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    with StandInServer(args.latency, args.jitter, args.failure_rate, args.throttle_rate) as server:
+        print(f"Serving fixtures at {server.base_url}/en/players/ (Ctrl+C to stop)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
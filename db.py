@@ -0,0 +1,134 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# PRAGMAs applied to every connection
+CACHE_SIZE_KB = 64 * 1024        # page cache per connection
+MMAP_SIZE = 256 * 1024 * 1024    # memory-mapped reads
+BUSY_TIMEOUT_MS = 30 * 1000
+
+
+def writer_connection(db_path):
+    """
+    Open the crawler's writer connection
+
+    Switches the database to WAL, so API readers keep reading the last
+    committed snapshot while the crawler writes.
+    """
+    conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def read_connection(db_path):
+    """
+    Open a read-only connection with the API's PRAGMAs
+
+    Used by the pool, and on its own for long reads (exports, snapshots)
+    that should not hold a pooled connection; close it when done.
+    """
+    conn = sqlite3.connect(
+        f"file:{db_path}?mode=ro",
+        uri=True,
+        timeout=BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False
+    )
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+    return conn
+
+
+def close_writer(conn):
+    """
+    Fold the WAL back into the database file, then close the writer connection
+
+    Readers may still hold connections, so the writer is not necessarily the
+    last to close and SQLite would leave the data in the -wal file; the
+    database file on its own (as committed by the workflow) must be complete.
+    """
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of read-only SQLite connections for API workers
+
+    Connections are opened once and reused, so a request does not pay for
+    connect and PRAGMA setup.
+    """
+
+    def __init__(self, db_path, max_size=8):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+        self.opened = 0
+
+    def _open(self):
+        return read_connection(self.db_path)
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            if self.opened < self.max_size:
+                self.opened += 1
+                try:
+                    return self._open()
+                except Exception:
+                    self.opened -= 1
+                    raise
+
+        # Pool is full, wait for a connection to come back
+        return self.idle.get()
+
+    def release(self, conn):
+        self.idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection for the duration of a with block"""
+        conn = self.acquire()
+        try:
+            yield conn
+        except sqlite3.DatabaseError:
+            # Don't hand a possibly broken connection to the next request
+            conn.close()
+            with self.lock:
+                self.opened -= 1
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self.lock:
+            self.opened = 0
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_read_pool(db_path, max_size=8):
+    """Return the shared read pool for db_path, creating it on first use"""
+    with pools_lock:
+        if db_path not in pools:
+            pools[db_path] = ConnectionPool(db_path, max_size=max_size)
+        return pools[db_path]
@@ -0,0 +1,95 @@
+### Bulk export of the players table as NDJSON or CSV ###
+import argparse
+import csv
+import io
+import sys
+import zlib
+
+import player_queries
+from api.serialize import dumps
+from player_queries import EXPORT_COLUMNS, iter_players
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def ndjson_chunks(row_chunks):
+    """One JSON object per line, one bytes block per chunk of rows"""
+    for rows in row_chunks:
+        yield b''.join(dumps(dict(zip(EXPORT_COLUMNS, row))) + b'\n' for row in rows)
+
+
+def csv_chunks(row_chunks):
+    """CSV with a header line, one bytes block per chunk of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(EXPORT_COLUMNS)
+    # Header on its own, so an export without matching rows is still a valid CSV
+    yield buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+    for rows in row_chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def gzip_chunks(chunks, level=6):
+    """Gzip a stream of bytes blocks on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_players(fmt='ndjson', compress=False, **filters):
+    """
+    Stream the players table (joined with its letter code) as encoded bytes
+
+    Args:
+        fmt (str): 'ndjson' or 'csv'
+        compress (bool): Gzip the stream
+        **filters: letter, position, nationality, updated_since, after_id, limit (see iter_players)
+
+    Returns:
+        generator: bytes blocks, each one chunk of rows
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+
+    encode = ndjson_chunks if fmt == 'ndjson' else csv_chunks
+    chunks = encode(iter_players(**filters))
+    return gzip_chunks(chunks) if compress else chunks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the players table as NDJSON or CSV")
+    parser.add_argument('--db', default=player_queries.db_link, help="SQLite database path")
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='ndjson')
+    parser.add_argument('--gzip', action='store_true', help="Gzip the output")
+    parser.add_argument('--output', '-o', default='-', help="Output file ('-' for stdout)")
+    parser.add_argument('--letter')
+    parser.add_argument('--position')
+    parser.add_argument('--nationality')
+    parser.add_argument('--updated-since')
+    parser.add_argument('--after-id', type=int)
+    parser.add_argument('--limit', type=int)
+    args = parser.parse_args()
+
+    player_queries.db_link = args.db
+    stream = export_players(args.format, args.gzip, letter=args.letter, position=args.position,
+                            nationality=args.nationality, updated_since=args.updated_since,
+                            after_id=args.after_id, limit=args.limit)
+
+    output = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        for block in stream:
+            output.write(block)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
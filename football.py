@@ -1,27 +1,38 @@
-
-
-from functools import cache
+import hashlib
+import re
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 import sqlite3
 from datetime import datetime
 import time
+from concurrent.futures import ThreadPoolExecutor, CancelledError, as_completed, wait, FIRST_COMPLETED
 from log import log  # Import the log function
+from db import writer_connection, close_writer
+# Read side, re-exported so existing `from football import get_players` callers keep working
+from player_queries import (SORT_COLUMNS, POSITION_BITS, get_players, search_players, get_data_version,
+                            encode_cursor, decode_cursor)
+from services.fetcher import get_fetcher, ThreadFetchers, UNCHANGED, CRAWL_WORKERS
+from services.rate_limit import HostLimiter, call_with_retries, CircuitOpenError, RETRYABLE, CRAWL_RATE
+from services.http_cache import get_http_cache
+from metrics import CrawlMetrics
+from player_stats import create_player_stats
+from work_queue import (new_worker_id, enqueue_pending_letters, reset_work_queue, claim_letters,
+                        complete_letter, fail_letter, LeaseHeartbeat)
 
 db_link="./data/football.db"
 
-def load_player_codes():
+def load_player_codes(backend=None, cache_mode=None):
+    """
+    Load player letter codes from fbref.com and save to player_codes table
+
+    Args:
+        backend (str): Fetch backend, 'http' or 'selenium' (default: FETCH_BACKEND env var)
+        cache_mode (str): HTTP cache 'on', 'off' or 'offline' (default: HTTP_CACHE_MODE env var)
+    """
 
-    # Create/connect to SQLite database
-    conn = sqlite3.connect(db_link)
+    # Create/connect to SQLite database (WAL writer, readers are not blocked)
+    conn = writer_connection(db_link)
     cursor = conn.cursor()
 
     # Drop the existing table first to ensure clean schema
@@ -38,86 +49,65 @@ def load_player_codes():
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
     ''')
+    create_data_meta(cursor)
+    conn.commit()
 
     target_link = "https://fbref.com/en/players/"
     players_codes = []
+    attempts = 0
+
+    def on_attempt(attempt):
+        nonlocal attempts
+        attempts = attempt
 
     try:
-        # Setup Chrome options with additional stability settings
-        chrome_options = Options()
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-        chrome_options.add_argument('--disable-features=VizDisplayCompositor')
-        chrome_options.add_argument('--disable-extensions')
-        chrome_options.add_argument('--headless')  # Run in headless mode
-        
-        # Use ChromeDriver without specifying version
-        driver = webdriver.Chrome(
-            service=Service(ChromeDriverManager().install()),
-            options=chrome_options
+        metrics = CrawlMetrics(conn, 'player_codes')
+        fetcher = get_fetcher(backend, cache=get_http_cache(cache_mode))
+
+        # An unchanged index page can't hold new codes once we have some
+        cursor.execute("SELECT 1 FROM player_codes LIMIT 1")
+        has_codes = cursor.fetchone() is not None
+
+        # Load the index page with retry mechanism
+        letter_links = call_with_retries(
+            HostLimiter(), target_link,
+            lambda: fetcher.load_player_codes(target_link, if_changed=has_codes),
+            on_attempt=on_attempt
         )
-        
-        # Set page load timeout
-        driver.set_page_load_timeout(30)
-        
-        # Navigate to the page with retry mechanism
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                driver.get(target_link)
-                break
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise e
-                time.sleep(2)
+        timing = fetcher.last_timing
 
-        # Wait for the page to load completely
-        WebDriverWait(driver, 20).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
-        
-        print(f"Page title: {driver.title}")
-        
-        # Use a more direct approach - find all links on the page
-        all_links = driver.find_elements(By.TAG_NAME, "a")
-        
-        # Filter links that match the pattern for player letter codes
-        for link in all_links:
-            href = link.get_attribute('href')
-            text = link.text.strip()
+        if letter_links is UNCHANGED:
+            metrics.record_letter(cursor, 'index', 'unchanged', retries=attempts - 1, **timing)
+            conn.commit()
+            print("Player index page not modified since last crawl, skipping")
+            return True
+
+        # Filter out letter codes we already have
+        for letter_link in letter_links:
+            letter_code = letter_link['letter']
+            href = letter_link['url']
+
+            # Check if letter code already exists
+            cursor.execute("""
+                SELECT id FROM player_codes 
+                WHERE letter = ?
+            """, (letter_code,))
             
-            # Check if this is a valid player letter code link
-            if (href and text and '/en/players/' in href and 
-                len(text) == 2 and  # Exactly 2 characters
-                text[0].isalpha() and text[1].isalpha() and  # Both characters are letters
-                text[0].isupper() and text[1].islower() and  # First uppercase, second lowercase
-                href.endswith('/')):  # Ensure URL ends with /
-                
-                # Extract letter code from URL as backup
-                url_letter = href.split('/players/')[1].strip('/')
-                letter_code = text
-                
-                # Check if letter code already exists
-                cursor.execute("""
-                    SELECT id FROM player_codes 
-                    WHERE letter = ?
-                """, (letter_code,))
-                
-                existing_code = cursor.fetchone()
-                
-                if not existing_code:
-                    print(f"Found new letter code: {letter_code}, URL: {href}")
-                    player_code = {
-                        'letter': letter_code,
-                        'url': href
-                    }
-                    players_codes.append(player_code)
-                else:
-                    print(f"Letter code {letter_code} already exists, skipping")
+            existing_code = cursor.fetchone()
+            
+            if not existing_code:
+                print(f"Found new letter code: {letter_code}, URL: {href}")
+                player_code = {
+                    'letter': letter_code,
+                    'url': href
+                }
+                players_codes.append(player_code)
+            else:
+                print(f"Letter code {letter_code} already exists, skipping")
         
         print(f"Total new player codes found: {len(players_codes)}")
 
+        write_started = time.monotonic()
         if players_codes:
             # Convert players_codes list to DataFrame
             player_codes_df = pd.DataFrame(players_codes)
@@ -127,8 +117,14 @@ def load_player_codes():
             player_codes_df.to_sql('player_codes', conn, 
                                     if_exists='append', 
                                     index=False)
+            bump_data_version(cursor)
+            conn.commit()
             print("New player_codes_df saved successfully")
 
+        metrics.record_letter(cursor, 'index', 'saved' if players_codes else 'empty', rows=len(letter_links),
+                              retries=attempts - 1, db_seconds=time.monotonic() - write_started, **timing)
+        conn.commit()
+
         # Get the saved data
         result = pd.read_sql_query("""
             SELECT id, letter, url, created_at 
@@ -143,32 +139,37 @@ def load_player_codes():
 
     except Exception as e:
         print(f"load_player_codes error occurred: {e}")
+        if 'metrics' in locals():
+            metrics.record_letter(cursor, 'index', 'failed', retries=max(0, attempts - 1))
+            conn.commit()
         return False
 
     finally:
-        if 'driver' in locals():
-            driver.quit()
-        conn.close()
+        if 'fetcher' in locals():
+            fetcher.close()
+        if 'metrics' in locals():
+            try:
+                metrics.finish()
+            except Exception as e:
+                print(f"Error saving crawl metrics: {e}")
+        close_writer(conn)
 
 
 def load_player_codes_status_reset():
     """
-    Load player codes from fbref.com and save to player_codes table
+    Reset player_codes status so the next load_player run refreshes every letter
     """
-    # Create/connect to SQLite database
-    conn = sqlite3.connect(db_link)
+    # Create/connect to SQLite database (WAL writer, readers are not blocked)
+    conn = writer_connection(db_link)
     cursor = conn.cursor()
 
     try:
-        # DROP TABLE IF EXISTS players
-        cursor.execute('DROP TABLE IF EXISTS players')
-
-
-        # After processing all players for this letter
+        # players is kept: the next load_player upserts by url and only writes the delta
         cursor.execute("""
             UPDATE player_codes 
             SET status = 0 
         """)
+        reset_work_queue(cursor)
         conn.commit()
         print(f"Updated status RESET for all letters")
         print("load_player_codes_status_reset executed successfully")
@@ -178,13 +179,14 @@ def load_player_codes_status_reset():
         print(f"Error updating status RESET for letter")
         conn.rollback()
 
-def load_player():
+    finally:
+        close_writer(conn)
+
+def create_players_table(conn):
     """
-    Load player information from player_codes table URLs and save to players table
+    Create the players table (without dropping it) with its migrations,
+    indexes, search table and summary counts
     """
-    
-    # Create/connect to SQLite database
-    conn = sqlite3.connect(db_link)
     cursor = conn.cursor()
 
     # Create players table if it doesn't exist (without dropping it)
@@ -202,204 +204,687 @@ def load_player():
         league TEXT,
         years TEXT,
         position TEXT,
+        first_year INTEGER,
+        last_year INTEGER,
+        position_mask INTEGER,
         additional_info TEXT,
         about TEXT,
         player_code_id INTEGER,
+        letter TEXT,
         url TEXT,
+        content_hash TEXT,
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP,
+        details_fetched_at TIMESTAMP,
+        details_error TEXT,
         FOREIGN KEY (player_code_id) REFERENCES player_codes(id)
     )
     ''')
+    migrate_players_table(conn)
+    create_player_indexes(conn)
+    create_player_search(conn)
+    create_player_stats(conn)
+
+
+def migrate_players_table(conn):
+    """
+    Bring an existing players table up to the upsert schema
+
+    Adds content_hash/updated_at, the details_* columns, letter (copied from player_codes) and the
+    parsed filter columns (filled from years/position when they are added), removes duplicate urls left by earlier append-only runs
+    (keeping the newest row) and makes url unique.
+    """
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(players)")
+    existing_columns = {column[1] for column in cursor.fetchall()}
+    if 'content_hash' not in existing_columns:
+        cursor.execute("ALTER TABLE players ADD COLUMN content_hash TEXT")
+    if 'updated_at' not in existing_columns:
+        cursor.execute("ALTER TABLE players ADD COLUMN updated_at TIMESTAMP")
+    if 'details_fetched_at' not in existing_columns:
+        cursor.execute("ALTER TABLE players ADD COLUMN details_fetched_at TIMESTAMP")
+    if 'details_error' not in existing_columns:
+        cursor.execute("ALTER TABLE players ADD COLUMN details_error TEXT")
+    if 'letter' not in existing_columns:
+        # Copy of player_codes.letter, so sorting by letter can use an index on players
+        cursor.execute("ALTER TABLE players ADD COLUMN letter TEXT")
+        cursor.execute("""
+            UPDATE players SET letter = (SELECT letter FROM player_codes WHERE id = players.player_code_id)
+        """)
+    if 'position_mask' not in existing_columns:
+        cursor.execute("ALTER TABLE players ADD COLUMN first_year INTEGER")
+        cursor.execute("ALTER TABLE players ADD COLUMN last_year INTEGER")
+        cursor.execute("ALTER TABLE players ADD COLUMN position_mask INTEGER")
+        backfill_player_filters(cursor)
+
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_players_url_unique'")
+    if cursor.fetchone() is None:
+        cursor.execute("""
+            DELETE FROM players
+            WHERE url IS NOT NULL
+            AND id NOT IN (SELECT MAX(id) FROM players WHERE url IS NOT NULL GROUP BY url)
+        """)
+        if cursor.rowcount:
+            log(f"Removed {cursor.rowcount} duplicate player urls", phase='migrate')
+        cursor.execute("CREATE UNIQUE INDEX idx_players_url_unique ON players(url)")
+    conn.commit()
+
+
+def parse_years(years):
+    """
+    First and last year of a career from the years text
+
+    Args:
+        years (str): "2001-2015", or "2019" for a single season
+
+    Returns:
+        tuple: (first_year, last_year), (None, None) when there is no year
+    """
+    found = re.findall(r'\d{4}', years or '')
+    if not found:
+        return None, None
+    return int(found[0]), int(found[-1])
+
+
+def parse_position_mask(position):
+    """Bitmask of the POSITION_BITS codes in a position text such as "FW-MF" (0 when none)"""
+    mask = 0
+    for code in re.split(r'[^A-Z]+', (position or '').upper()):
+        mask |= POSITION_BITS.get(code, 0)
+    return mask
+
+
+def backfill_player_filters(cursor, batch_size=5000):
+    """Fill first_year, last_year and position_mask from years/position for every row, without committing"""
+    cursor.execute("SELECT id, years, position FROM players")
+    rows = cursor.fetchall()
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(
+            "UPDATE players SET first_year = ?, last_year = ?, position_mask = ? WHERE id = ?",
+            [parse_years(years) + (parse_position_mask(position), player_id)
+             for player_id, years, position in rows[start:start + batch_size]]
+        )
+    log(f"Parsed years and position of {len(rows)} players", phase='migrate')
+
+
+def player_content_hash(player, player_code_id):
+    """Hash of the crawled fields of a player row, used to skip unchanged rows"""
+    content = '\x1f'.join([
+        player['name'], player['years'], player['position'],
+        player['additional_info'], str(player_code_id)
+    ])
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def save_letter_players(cursor, player_code_id, player_rows):
+    """
+    Upsert one letter's players by url, without committing
+
+    New urls are inserted, rows whose content hash changed are updated and
+    unchanged rows are not written at all.
+
+    Returns:
+        tuple: (inserted, updated)
+    """
+    # Inserts are counted over the whole table (kept by the players_count triggers): a url moving
+    # here from another letter is an update, not an insert
+    cursor.execute("SELECT row_count FROM table_counts WHERE name = 'players'")
+    before = cursor.fetchone()[0]
+    cursor.execute("SELECT letter FROM player_codes WHERE id = ?", (player_code_id,))
+    letter_row = cursor.fetchone()
+    letter = letter_row[0] if letter_row else None
+
+    cursor.executemany("""
+        INSERT INTO players 
+            (name, years, position, first_year, last_year, position_mask, additional_info, player_code_id, letter,
+             url, content_hash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(url) DO UPDATE SET
+            name = excluded.name,
+            years = excluded.years,
+            position = excluded.position,
+            first_year = excluded.first_year,
+            last_year = excluded.last_year,
+            position_mask = excluded.position_mask,
+            additional_info = excluded.additional_info,
+            player_code_id = excluded.player_code_id,
+            letter = excluded.letter,
+            content_hash = excluded.content_hash,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE players.content_hash IS NOT excluded.content_hash
+    """, [
+        (p['name'], p['years'], p['position'], *parse_years(p['years']), parse_position_mask(p['position']),
+         p['additional_info'], player_code_id, letter, p['url'], player_content_hash(p, player_code_id))
+        for p in player_rows
+    ])
+    changed = cursor.rowcount
+
+    cursor.execute("SELECT row_count FROM table_counts WHERE name = 'players'")
+    inserted = cursor.fetchone()[0] - before
+    return inserted, changed - inserted
+
+
+def create_player_indexes(conn):
+    """
+    Create the indexes and the maintained row count used by get_players
+
+    Every sort column gets a (column, id) index so keyset pages are index
+    range scans, the filter columns get covering indexes so filtered totals
+    never read the rows, and triggers keep table_counts in step with
+    players so the unfiltered total does not need a COUNT(*) per request.
+    """
+    cursor = conn.cursor()
+
+    for column in ['name', 'years', 'position', 'additional_info', 'player_code_id', 'letter', 'url']:
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_players_{column} ON players({column}, id)")
+    # players.letter is a copy of player_codes.letter; follow renames of a code
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS player_codes_letter_update AFTER UPDATE OF letter ON player_codes
+        BEGIN
+            UPDATE players SET letter = new.letter WHERE player_code_id = new.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_players_position_mask ON players(position_mask, last_year, first_year)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_players_last_year ON players(last_year, first_year)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_players_first_year ON players(first_year, last_year)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_player_codes_letter ON player_codes(letter, id)")
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS table_counts (
+        name TEXT PRIMARY KEY,
+        row_count INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute("""
+        INSERT OR IGNORE INTO table_counts (name, row_count)
+        SELECT 'players', COUNT(*) FROM players
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS players_count_insert AFTER INSERT ON players
+        BEGIN
+            UPDATE table_counts SET row_count = row_count + 1 WHERE name = 'players';
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS players_count_delete AFTER DELETE ON players
+        BEGIN
+            UPDATE table_counts SET row_count = row_count - 1 WHERE name = 'players';
+        END
+    """)
+    conn.commit()
+
+
+def create_player_search(conn):
+    """
+    Create the players_fts full-text index over players
+
+    External-content FTS5 table kept in sync by triggers; the first time it
+    is created it is filled from the rows already in players.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'players_fts'")
+    exists = cursor.fetchone() is not None
+
+    cursor.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS players_fts USING fts5(
+        name, other_name, position, additional_info,
+        content='players', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    ''')
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS players_fts_insert AFTER INSERT ON players
+        BEGIN
+            INSERT INTO players_fts (rowid, name, other_name, position, additional_info)
+            VALUES (new.id, new.name, new.other_name, new.position, new.additional_info);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS players_fts_delete AFTER DELETE ON players
+        BEGIN
+            INSERT INTO players_fts (players_fts, rowid, name, other_name, position, additional_info)
+            VALUES ('delete', old.id, old.name, old.other_name, old.position, old.additional_info);
+        END
+    """)
+    # Only the indexed columns: detail, letter and filter updates must not rewrite the index.
+    # Dropped first so databases created with the unrestricted trigger pick this one up.
+    cursor.execute("DROP TRIGGER IF EXISTS players_fts_update")
+    cursor.execute("""
+        CREATE TRIGGER players_fts_update AFTER UPDATE OF name, other_name, position, additional_info ON players
+        WHEN old.name IS NOT new.name OR old.other_name IS NOT new.other_name
+            OR old.position IS NOT new.position OR old.additional_info IS NOT new.additional_info
+        BEGIN
+            INSERT INTO players_fts (players_fts, rowid, name, other_name, position, additional_info)
+            VALUES ('delete', old.id, old.name, old.other_name, old.position, old.additional_info);
+            INSERT INTO players_fts (rowid, name, other_name, position, additional_info)
+            VALUES (new.id, new.name, new.other_name, new.position, new.additional_info);
+        END
+    """)
+
+    if not exists:
+        cursor.execute("INSERT INTO players_fts (players_fts) VALUES ('rebuild')")
+    conn.commit()
+
+
+def create_data_meta(cursor):
+    """Create the data_meta table holding the data version read by API caches"""
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS data_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO data_meta (key, value) VALUES ('data_version', 0)")
+
+
+def bump_data_version(cursor):
+    """Mark the player data as changed; call inside the transaction that changes it"""
+    cursor.execute("UPDATE data_meta SET value = value + 1 WHERE key = 'data_version'")
+
+
+def publish_snapshot():
+    """
+    Refresh the Parquet/Arrow snapshot for analysts after a load
 
+    Skipped when SNAPSHOT_MODE is off, pyarrow is not installed or the
+    current data version is already published; never fails the load.
+    """
+    import snapshot  # pyarrow is only loaded by the loaders that publish
+
+    if snapshot.SNAPSHOT_MODE == 'off':
+        return
     try:
-        # Setup Chrome options
-        chrome_options = Options()
-        chrome_options.add_argument('--headless')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--disable-gpu')
-
-        # Setup Chrome driver with webdriver-manager
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=chrome_options)
-
-        # Get unprocessed player codes from the database
-        player_codes = pd.read_sql_query("""
-            SELECT * FROM player_codes 
-            WHERE status = 0 
-            ORDER BY id 
-            LIMIT 100
-        """, conn)
-        
-        log(f"Processing {len(player_codes)} player codes")
-        
-        if len(player_codes) == 0:
-            log("No unprocessed player codes found")
-            return True
+        meta = snapshot.write_snapshot(db_link)
+    except ImportError as e:
+        log(f"Snapshot skipped: {e}", level='WARNING', phase='snapshot')
+        return
+    except Exception as e:
+        log(f"Error writing snapshot: {str(e)[:100]}", level='WARNING', phase='snapshot')
+        return
+
+    if meta is not None:
+        log(f"Published snapshot of {meta['rows']} players (data version {meta['data_version']})",
+            phase='snapshot', rows=meta['rows'], duration=meta['seconds'])
+
+
+def load_player(backend=None, workers=CRAWL_WORKERS, rate=CRAWL_RATE, max_concurrency=None, cache_mode=None,
+                limit=100):
+    """
+    Load player information from player_codes table URLs and save to players table
+
+    Letter pages are fetched by a pool of `workers` threads; parsed rows are
+    written from this thread, so SQLite keeps a single writer. Each letter is
+    committed on its own, so only one page of rows is held in memory.
+
+    Letters are leased from the crawl_queue table, so several load_player
+    processes can run against the same database and drain disjoint letters.
+    A process that dies stops renewing its leases and its letters are
+    claimed again once they expire.
+
+    Args:
+        backend (str): Fetch backend, 'http' or 'selenium' (default: FETCH_BACKEND env var).
+            Pages the HTTP backend cannot parse fall back to selenium.
+        workers (int): Number of letter pages in flight (default: CRAWL_WORKERS env var)
+        rate (float): Starting requests per second per host (default: CRAWL_RATE env var);
+            adapts between CRAWL_MIN_RATE and CRAWL_MAX_RATE as the site allows
+        max_concurrency (int): Max requests in flight per host (default: workers)
+        cache_mode (str): HTTP cache 'on', 'off' or 'offline' (default: HTTP_CACHE_MODE env var).
+            A letter already in the database whose page answers 304 is marked
+            done without parsing or writing anything.
+        limit (int): Max letters this call processes
+    """
+    
+    # Create/connect to SQLite database (WAL writer, readers are not blocked)
+    conn = writer_connection(db_link)
+    cursor = conn.cursor()
+
+    create_players_table(conn)
+    create_data_meta(cursor)
+    conn.commit()
+
+    workers = max(1, workers)
+    limiter = HostLimiter(rate=rate, max_concurrency=max_concurrency or workers)
+    http_cache = get_http_cache(cache_mode)
+
+    # Letters with saved players may be skipped when their page is unchanged
+    cursor.execute("SELECT DISTINCT player_code_id FROM players")
+    letters_with_players = {player_code_id for (player_code_id,) in cursor.fetchall()}
+
+    # Fetchers are not thread-safe, so every worker thread gets its own
+    fetchers = ThreadFetchers(backend, cache=http_cache)
+
+    def fetch_letter(row):
+        """
+        Fetch and parse one letter page, with retries. Runs in a worker thread.
+
+        Timings, bytes and retries of the letter are left in row['stats'].
+        """
+        max_retries = 3
+        stats = row['stats'] = {'retries': 0, 'fetch_seconds': 0.0, 'parse_seconds': 0.0, 'bytes': 0}
+
+        def on_attempt(attempt):
+            stats['retries'] = attempt - 1
+            log(f"Processing letter code: {row['letter']} (ID: {row['id']}) - Attempt {attempt}",
+                phase='fetch', letter=row['letter'], attempt=attempt)
+
+        def on_error(attempt, kind, e):
+            log(f"Error processing letter {row['letter']} ({kind}): {str(e)[:100]}",
+                level='WARNING', phase='fetch', letter=row['letter'], attempt=attempt, error_kind=kind)
+            if attempt == max_retries or kind not in RETRYABLE:
+                log(f"Failed to process letter {row['letter']} after {attempt} attempts",
+                    level='ERROR', phase='fetch', letter=row['letter'])
+
+        def fetch():
+            fetcher = fetchers.primary()
+            player_rows = fetcher.load_player_rows(
+                row['url'], if_changed=row['id'] in letters_with_players
+            )
+
+            # Page without section_content (e.g. rendered by JS): retry it in Chrome
+            used = [fetcher]
+            if player_rows is None:
+                log(f"No section_content via {fetcher.name} for letter {row['letter']}, falling back to selenium",
+                    level='WARNING', phase='fetch', letter=row['letter'])
+                used.append(fetchers.fallback())
+                player_rows = used[-1].load_player_rows(row['url'])
+
+            for name in ('fetch_seconds', 'parse_seconds', 'bytes'):
+                stats[name] = sum(f.last_timing.get(name, 0) for f in used)
+
+            if player_rows is None:
+                raise ValueError("No section_content on letter page")
+            return player_rows
+
+        return call_with_retries(limiter, row['url'], fetch, max_attempts=max_retries,
+                                 on_attempt=on_attempt, on_error=on_error)
+
+    worker_id = new_worker_id()
+    heartbeat = None
+    run_started = time.monotonic()
+
+    try:
+        metrics = CrawlMetrics(conn, 'players', worker_id=worker_id)
+
+        # Queue unprocessed player codes; other crawler processes share the same queue
+        enqueue_pending_letters(conn)
+        heartbeat = LeaseHeartbeat(lambda: writer_connection(db_link), worker_id).start()
+
+        log(f"Worker {worker_id} processing up to {limit} player codes with {workers} thread(s)")
             
-        players_data = []
+        saved_count = 0
+        claimed_count = 0
+        futures = {}
+
+        def claim_more(executor):
+            """Lease letters from the queue until `workers` are in flight or the limit is hit"""
+            nonlocal claimed_count
+            if limiter.circuit_open():
+                log("Site is refusing requests (circuit open), not claiming more letters", level='WARNING', phase='claim')
+                return
+            want = min(workers - len(futures), limit - claimed_count)
+            for row in claim_letters(conn, worker_id, want):
+                claimed_count += 1
+                futures[executor.submit(fetch_letter, row)] = row
         
-        # Process each URL from player_codes
-        for _, row in player_codes.iterrows():
-            max_retries = 3
-            retry_count = 0
-            success = False
-            
-            while retry_count < max_retries and not success:
-                try:
-                    log(f"Processing letter code: {row['letter']} (ID: {row['id']}) - Attempt {retry_count + 1}")
-                    driver.get(row['url'])
-                    
-                    # Add explicit wait with longer timeout
-                    wait = WebDriverWait(driver, 30)
-                    wait.until(
-                        EC.presence_of_element_located((By.CLASS_NAME, "section_content"))
-                    )
-                    
-                    # Add small delay after page load
-                    time.sleep(2)
-                    
-                    # Find all player rows
-                    player_rows = driver.find_elements(By.CSS_SELECTOR, ".section_content p")
-                    
-                    players_count = 0
-                    for player_row in player_rows:
-                        try:
-                            player_text = player_row.text.strip()
-                            if player_text:
-                                parts = player_text.split('·')
-                                
-                                if len(parts) >= 3:
-                                    player_url = player_row.find_element(By.TAG_NAME, 'a').get_attribute('href')
-                                    
-                                    player_info = {
-                                        'name': parts[0].strip(),
-                                        'years': parts[1].strip(),
-                                        'position': parts[2].strip(),
-                                        'additional_info': ' '.join(parts[3:]).strip() if len(parts) > 3 else '',
-                                        'player_code_id': row['id'],
-                                        'url': player_url
-                                    }
-                                    players_data.append(player_info)
-                                    players_count += 1
-                        except Exception as e:
-                            log(f"Error processing player row: {str(e)[:100]}")  # Limit error message length
-                            continue
-                    
-                    log(f"Found {players_count} players for letter code {row['letter']}")
-                    
-                    # Update database in a single transaction
-                    if players_count > 0:
-                        cursor.execute("""
-                            UPDATE player_codes 
-                            SET status = 1 
-                            WHERE id = ?
-                        """, (row['id'],))
+        # Keep `workers` letter pages in flight, save each one as it completes
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            claim_more(executor)
+            if not futures:
+                log("No unprocessed player codes found")
+                return True
+
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # Drop the future once handled so its page of rows can be freed
+                    row = futures.pop(future)
+                    try:
+                        player_rows = future.result()
+                    except Exception as e:
+                        state = fail_letter(conn, worker_id, row['id'], e)
+                        metrics.record_letter(cursor, row['letter'], 'failed', **row.get('stats', {}))
                         conn.commit()
-                        log(f"Updated status for letter {row['letter']} (ID: {row['id']})")
-                    
-                    success = True
+                        log(f"Letter {row['letter']} released to the queue as {state} (attempt {row['attempts']})",
+                            level='WARNING', phase='claim', letter=row['letter'])
+                        continue
+
+                    if player_rows is UNCHANGED:
+                        players_count = 0
+                        log(f"Letter code {row['letter']} not modified since last crawl, skipping parse",
+                            phase='fetch', letter=row['letter'])
+                    else:
+                        players_count = len(player_rows)
+                        log(f"Found {players_count} players for letter code {row['letter']}",
+                            phase='parse', letter=row['letter'], rows=players_count)
                     
-                except sqlite3.OperationalError as e:
-                    if "database is locked" in str(e):
-                        retry_count += 1
-                        log(f"Database locked, retrying in 5 seconds... (Attempt {retry_count})")
-                        time.sleep(5)
+                        if players_count == 0:
+                            # Nothing to save: leave status 0 so the next cycle looks again
+                            complete_letter(cursor, worker_id, row['id'])
+                            metrics.record_letter(cursor, row['letter'], 'empty', **row['stats'])
+                            conn.commit()
+                            continue
+
+                    # Save the letter's players, its status and its queue entry in a
+                    # single transaction, so a killed run never marks a letter done
+                    # without its rows
+                    max_retries = 3
+                    retry_count = 0
+                    while retry_count < max_retries:
+                        try:
+                            write_started = time.monotonic()
+                            inserted, updated = 0, 0
+                            if player_rows is not UNCHANGED:
+                                inserted, updated = save_letter_players(cursor, row['id'], player_rows)
+                            cursor.execute("""
+                                UPDATE player_codes 
+                                SET status = 1 
+                                WHERE id = ?
+                            """, (row['id'],))
+                            complete_letter(cursor, worker_id, row['id'])
+                            if inserted or updated:
+                                bump_data_version(cursor)
+                            db_seconds = time.monotonic() - write_started
+                            metrics.record_letter(cursor, row['letter'],
+                                                  'unchanged' if player_rows is UNCHANGED else 'saved',
+                                                  db_seconds=db_seconds, rows=players_count, **row['stats'])
+                            conn.commit()
+                            saved_count += inserted + updated
+                            log(f"Saved letter {row['letter']} (ID: {row['id']}): {inserted} new, {updated} updated, "
+                                f"{players_count - inserted - updated} unchanged; status updated",
+                                phase='db', letter=row['letter'], rows=players_count, inserted=inserted,
+                                updated=updated, duration=round(db_seconds, 4))
+                            break
+                        except sqlite3.OperationalError as e:
+                            conn.rollback()
+                            if "database is locked" in str(e):
+                                retry_count += 1
+                                log(f"Database locked, retrying in 5 seconds... (Attempt {retry_count})",
+                                    level='WARNING', phase='db', letter=row['letter'])
+                                time.sleep(5)
+                            else:
+                                log(f"Database error: {str(e)[:100]}", level='ERROR', phase='db', letter=row['letter'])
+                                raise e
                     else:
-                        log(f"Database error: {str(e)[:100]}")
-                        raise e
-                except Exception as e:
-                    retry_count += 1
-                    log(f"Error processing letter {row['letter']}: {str(e)[:100]}")
-                    if retry_count == max_retries:
-                        log(f"Failed to process letter {row['letter']} after {max_retries} attempts")
-                    time.sleep(5)
-        
-        if players_data:
-            # Convert to DataFrame and save to database
-            players_df = pd.DataFrame(players_data)
-            players_df.to_sql('players', conn, if_exists='append', index=False)
-            log(f"Successfully saved {len(players_data)} players to database")
+                        # Still locked after every retry: release the letter instead of holding its lease
+                        state = fail_letter(conn, worker_id, row['id'], "database is locked")
+                        metrics.record_letter(cursor, row['letter'], 'failed', **row.get('stats', {}))
+                        conn.commit()
+                        log(f"Could not save letter {row['letter']} after {max_retries} attempts (database locked), "
+                            f"released to the queue as {state}", level='ERROR', phase='db', letter=row['letter'])
+
+                claim_more(executor)
         
-        log("load_player executed successfully")
+        log(f"Successfully saved {saved_count} new or changed players to database")
+        # Fresh statistics let the planner pick between the filter indexes and a scan by id
+        conn.execute("ANALYZE players")
+        publish_snapshot()
+        log("load_player executed successfully", phase='run', duration=round(time.monotonic() - run_started, 3))
         return True
 
     except Exception as e:
-        log(f"Error in load_player: {str(e)[:100]}")
+        log(f"Error in load_player: {str(e)[:100]}", level='ERROR')
         return False
 
     finally:
-        if 'driver' in locals():
-            driver.quit()
-        conn.close()
+        if heartbeat is not None:
+            heartbeat.stop()
+        fetchers.close()
+        if 'metrics' in locals():
+            try:
+                metrics.finish()
+            except Exception as e:
+                log(f"Error saving crawl metrics: {str(e)[:100]}", level='WARNING')
+        close_writer(conn)
 
 
-def get_players(page=1, page_size=10, sort_column='id', sort_order='asc'):
+def load_player_details(backend=None, workers=CRAWL_WORKERS, rate=CRAWL_RATE, max_concurrency=None,
+                        cache_mode=None, limit=1000, max_age_days=30, batch_size=50):
     """
-    Get player information from the players table in the database with pagination and sorting
-    
+    Visit stored player pages and fill the biography columns of players
+
+    Incremental and resumable: only players never fetched, or fetched more
+    than max_age_days ago, are picked (failed ones again after a day), and
+    results are committed every batch_size players. Players whose career
+    ends latest (active players) go first.
+
     Args:
-        page (int): Page number (starting from 1)
-        page_size (int): Number of records per page
-        sort_column (str): Column to sort by
-        sort_order (str): Sort direction ('asc' or 'desc')
-        
-    Returns:
-        tuple: (DataFrame of players, total_records)
+        backend (str): Fetch backend, 'http' or 'selenium' (default: FETCH_BACKEND env var)
+        workers (int): Number of player pages in flight (default: CRAWL_WORKERS env var)
+        rate (float): Starting requests per second per host (default: CRAWL_RATE env var);
+            adapts between CRAWL_MIN_RATE and CRAWL_MAX_RATE as the site allows
+        max_concurrency (int): Max requests in flight per host (default: workers)
+        cache_mode (str): HTTP cache 'on', 'off' or 'offline' (default: HTTP_CACHE_MODE env var)
+        limit (int): Max players this call visits
+        max_age_days (int): Refetch players whose details are older than this
+        batch_size (int): Players per commit
     """
-    # Create/connect to SQLite database
-    conn = sqlite3.connect(db_link)
+    # Create/connect to SQLite database (WAL writer, readers are not blocked)
+    conn = writer_connection(db_link)
     cursor = conn.cursor()
 
+    workers = max(1, workers)
+    limiter = HostLimiter(rate=rate, max_concurrency=max_concurrency or workers)
+    fetchers = ThreadFetchers(backend, cache=get_http_cache(cache_mode))
+
+    def fetch_details(player):
+        """Fetch and parse one player page, with retries. Runs in a worker thread."""
+        def fetch():
+            details = fetchers.primary().load_player_details(player['url'])
+            if details is None:
+                raise ValueError("No #meta block on player page")
+            return details
+
+        return call_with_retries(limiter, player['url'], fetch)
+
+    stale_filter = f"""
+        url IS NOT NULL AND (
+            details_fetched_at IS NULL
+            OR (details_error IS NULL AND details_fetched_at < datetime('now', '-{int(max_age_days)} days'))
+            OR (details_error IS NOT NULL AND details_fetched_at < datetime('now', '-1 day'))
+        )
+    """
+
     try:
-        # Validate and sanitize inputs to prevent SQL injection
-        valid_columns = ['id', 'name', 'years', 'position', 'additional_info', 
-                        'player_code_id', 'url', 'letter']
-        
-        if sort_column not in valid_columns:
-            sort_column = 'id'  # Default to id if invalid column
-            
-        sort_direction = 'DESC' if sort_order.lower() == 'desc' else 'ASC'
-        
-        # Calculate offset
-        offset = (page - 1) * page_size
-        
-        # Get total count first
-        cursor.execute("SELECT COUNT(*) FROM players")
-        total_records = cursor.fetchone()[0]
-        
-        # Query to get paginated players from the database
-        query = f"""
-        SELECT p.id, p.name, p.years, p.position, p.additional_info, 
-            p.player_code_id, p.url, pc.letter
-        FROM players p
-        JOIN player_codes pc ON p.player_code_id = pc.id
-        ORDER BY p.{sort_column} {sort_direction}
-        LIMIT ? OFFSET ?
-        """
-        
-        # Execute the query with parameters
-        cursor.execute(query, (page_size, offset))
-        players = cursor.fetchall()
-        
-        # Column names for the result
-        columns = ['id', 'name', 'years', 'position', 'additional_info', 
-                    'player_code_id', 'url', 'letter']
-        
-        # Convert the results to a list of dictionaries
-        players_data = []
-        for player in players:
-            player_dict = {columns[i]: player[i] for i in range(len(columns))}
-            players_data.append(player_dict)
-        
-        # Convert to DataFrame
-        players_df = pd.DataFrame(players_data)
-        
-        print(f"Retrieved {len(players_data)} players from database (page {page})")
-        return players_df, total_records
-        
+        create_players_table(conn)
+        create_data_meta(cursor)
+        conn.commit()
+
+        cursor.execute(f"SELECT COUNT(*) FROM players WHERE {stale_filter}")
+        remaining = cursor.fetchone()[0]
+
+        # Never fetched first, then the most recently active careers
+        cursor.execute(f"""
+            SELECT id, name, url FROM players
+            WHERE {stale_filter}
+            ORDER BY details_fetched_at IS NOT NULL, last_year DESC, id
+            LIMIT ?
+        """, (limit,))
+        players = [{'id': row[0], 'name': row[1], 'url': row[2]} for row in cursor.fetchall()]
+
+        log(f"Fetching details for {len(players)} of {remaining} stale players with {workers} worker(s)")
+        if not players:
+            return True
+
+        detail_columns = ['other_name', 'date_of_birth', 'place_of_birth', 'height', 'weight',
+                          'nationality', 'club', 'league', 'about']
+        updates = []
+        errors = []
+        fetched_count = 0
+        failed_count = 0
+        started_at = time.monotonic()
+
+        def save_batch():
+            cursor.executemany(f"""
+                UPDATE players
+                SET {', '.join(f'{column} = COALESCE(?, {column})' for column in detail_columns)},
+                    details_fetched_at = CURRENT_TIMESTAMP, details_error = NULL
+                WHERE id = ?
+            """, updates)
+            cursor.executemany("""
+                UPDATE players
+                SET details_fetched_at = CURRENT_TIMESTAMP, details_error = ?
+                WHERE id = ?
+            """, errors)
+            if updates:
+                bump_data_version(cursor)
+            conn.commit()
+            updates.clear()
+            errors.clear()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(fetch_details, player): player for player in players}
+
+            for future in as_completed(futures):
+                player = futures.pop(future)
+                try:
+                    details = future.result()
+                    updates.append(tuple(details[column] for column in detail_columns) + (player['id'],))
+                    fetched_count += 1
+                except CancelledError:
+                    continue
+                except CircuitOpenError:
+                    # Not the player's fault: leave it stale and stop queuing more pages
+                    # Cancel every pending page (any() would stop at the first one it cancelled)
+                    cancelled = [f for f in list(futures) if f.cancel()]
+                    if cancelled:
+                        log(f"Site is refusing requests (circuit open), cancelled {len(cancelled)} remaining "
+                            f"player pages", level='WARNING', phase='details')
+                    continue
+                except Exception as e:
+                    errors.append((str(e)[:200], player['id']))
+                    failed_count += 1
+                    log(f"Error fetching details for {player['name']} (ID: {player['id']}): {str(e)[:100]}",
+                        level='WARNING', phase='details')
+
+                if len(updates) + len(errors) >= batch_size:
+                    save_batch()
+
+                done_count = fetched_count + failed_count
+                if done_count % (batch_size * 10) == 0:
+                    elapsed = time.monotonic() - started_at
+                    log(f"Details progress: {done_count}/{len(players)} pages, "
+                        f"{done_count / elapsed:.2f} pages/s")
+
+        save_batch()
+
+        # Throughput report, used to size the job
+        elapsed = time.monotonic() - started_at
+        pages_per_second = (fetched_count + failed_count) / elapsed if elapsed else 0.0
+        still_remaining = remaining - fetched_count - failed_count
+        eta_hours = still_remaining / pages_per_second / 3600 if pages_per_second else 0.0
+        log(f"Fetched details for {fetched_count} players ({failed_count} failed) in {elapsed:.1f}s: "
+            f"{pages_per_second:.2f} pages/s, {still_remaining} remaining (~{eta_hours:.1f}h at this rate)")
+        publish_snapshot()
+        log("load_player_details executed successfully")
+        return True
+
     except Exception as e:
-        print(f"Error in get_players: {e}")
-        return pd.DataFrame(), 0
+        log(f"Error in load_player_details: {str(e)[:100]}", level='ERROR', phase='details')
+        return False
 
     finally:
-        conn.close()
\ No newline at end of file
+        fetchers.close()
+        close_writer(conn)
@@ -1,25 +1,159 @@
 from datetime import datetime
+import atexit
+import json
 import os
-def log(message):
+import queue
+import threading
+import time
+
+LOG_DIR = os.getenv("LOG_DIR", "log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_MAX_MB = float(os.getenv("LOG_MAX_MB", "50"))   # per day, then .1, .2, ... files
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+min_level = LEVELS.get(LOG_LEVEL, 20)
+
+
+class LogWriter:
+    """
+    Background thread that writes JSON-lines records to log/<date>.jsonl
+
+    Callers only put a dict on a queue; the thread batches whatever is
+    queued into one write, keeps the day's file open, moves to a new file
+    at midnight and when the size cap is reached.
+    """
+
+    def __init__(self, log_dir=LOG_DIR, max_bytes=LOG_MAX_MB * 1024 * 1024):
+        self.log_dir = log_dir
+        self.max_bytes = max_bytes
+        self.records = queue.SimpleQueue()
+        self.file = None
+        self.date = None
+        self.part = 0
+        self.next_midnight = 0.0
+        self.thread = threading.Thread(target=self.run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def open_file(self, now):
+        if self.file is not None:
+            self.file.close()
+
+        if now >= self.next_midnight:
+            today = datetime.fromtimestamp(now)
+            self.date = today.strftime('%Y-%m-%d')
+            self.part = 0
+            midnight = today.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+            self.next_midnight = midnight + 24 * 3600
+
+        # Create log directory if it doesn't exist
+        os.makedirs(self.log_dir, exist_ok=True)
+
+        # Skip parts that are already full (e.g. after a restart)
+        while True:
+            suffix = f'.{self.part}' if self.part else ''
+            path = os.path.join(self.log_dir, f'{self.date}{suffix}.jsonl')
+            if not os.path.exists(path) or os.path.getsize(path) < self.max_bytes:
+                break
+            self.part += 1
+
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def write(self, records):
+        now = records[-1]['time']
+        if self.file is None or now >= self.next_midnight:
+            self.open_file(now)
+
+        lines = []
+        for record in records:
+            fields = dict(record)
+            timestamp = datetime.fromtimestamp(fields.pop('time')).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+            lines.append(json.dumps({'ts': timestamp, **fields}, ensure_ascii=False, default=str))
+        self.file.write('\n'.join(lines) + '\n')
+        self.file.flush()
+
+        if self.file.tell() >= self.max_bytes:
+            self.part += 1
+            self.open_file(now)
+
+    def run(self):
+        while True:
+            record = self.records.get()
+            if record is None:
+                break
+
+            # Drain whatever else is queued into the same write
+            batch = [record]
+            stop = False
+            while len(batch) < 1000:
+                try:
+                    record = self.records.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    break
+                batch.append(record)
+
+            try:
+                self.write(batch)
+            except Exception as e:
+                print(f"Log write error: {e}")
+            if stop:
+                break
+
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def close(self):
+        """Write everything queued so far and stop the thread"""
+        if self.thread.is_alive():
+            self.records.put(None)
+            self.thread.join(timeout=5)
+
+
+writer = None
+writer_lock = threading.Lock()
+
+
+def get_writer():
+    global writer
+    if writer is None:
+        with writer_lock:
+            if writer is None:
+                writer = LogWriter()
+                atexit.register(writer.close)
+    return writer
+
+
+def log(message, level="INFO", **fields):
     """
     Log message to console and save to log file
+
+    Records are written as JSON lines by a background thread, so the
+    caller only pays for a queue put.
+
+    Args:
+        message (str): Log message
+        level (str): DEBUG, INFO, WARNING or ERROR; below LOG_LEVEL is dropped
+        **fields: Extra structured fields, e.g. phase='fetch', letter='Ab', duration=1.25
     """
-    # Get current date for log file name
-    
-    date = datetime.now().strftime('%Y-%m-%d')
-    log_dir = 'log'
-    
-    # Create log directory if it doesn't exist
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-        
-    # Log file path with current date
-    log_file = os.path.join(log_dir, f'{date}.log')
-    
+    if LEVELS.get(level, 20) < min_level:
+        return
+
     # Print to console
     print(message)
-    
-    # Save to log file
-    with open(log_file, 'a') as f:
-        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        f.write(f'[{timestamp}] {message}\n')
+
+    record = {'time': time.time(), 'level': level, 'message': message}
+    if fields:
+        record.update(fields)
+    get_writer().records.put(record)
+
+
+def flush():
+    """Block until every queued record is on disk; logging keeps working afterwards"""
+    global writer
+    with writer_lock:
+        if writer is not None:
+            writer.close()
+            writer = None
@@ -1,10 +1,26 @@
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from services.football_api import get_live_matches
-from football import get_player_codes
+from fastapi.responses import StreamingResponse
+from services.football_api import fetch_live_fixtures, get_quota
+from services.live_poller import LivePoller
+from player_queries import get_player_codes
+
+# Single upstream poller for live fixtures, shared by every client of this process
+live_poller = LivePoller(fetch_live_fixtures)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    live_poller.quota = get_quota()
+    live_poller.start()
+    yield
+    await live_poller.stop()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
-get
 
 @app.get("/")
 def read_root():
@@ -17,3 +33,25 @@ def read_item(name: str):
 @app.get("/player-codes")
 def player_codes():
     return get_player_codes()
+
+@app.get("/live")
+def live_matches():
+    """Latest live fixtures, from the poller's snapshot (no upstream call)"""
+    return live_poller.snapshot()
+
+@app.get("/live/stream")
+async def live_stream():
+    """Server-Sent Events: a snapshot event, then a changes event per poll that changed something"""
+    return StreamingResponse(
+        live_poller.stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+if __name__ == "__main__":
+    # The dot in the file name keeps uvicorn from importing it as main.api:app, so serve it from here;
+    # one process means one poller
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
@@ -1,6 +1,5 @@
-from football import load_player_codes, load_player_codes_status_reset, load_player, get_players
 from flask import Flask, jsonify
-from api.controllers.player import get_players_list
+from api.controllers.player import get_players_list, search_players_list, export_players_list, get_players_stats
 
 app = Flask(__name__)
 
@@ -13,14 +12,29 @@ app = Flask(__name__)
 #     except Exception as e:
 #         return jsonify({"status": "error", "message": str(e)}), 500
 
-# @app.route('/api/players/get-list', methods=['GET'])
-# def api_players_get_list():
-#     return get_players_list()
+@app.route('/api/players/get-list', methods=['GET'])
+def api_players_get_list():
+    return get_players_list()
+
+@app.route('/api/players/search', methods=['GET'])
+def api_players_search():
+    return search_players_list()
+
+@app.route('/api/players/export', methods=['GET'])
+def api_players_export():
+    return export_players_list()
+
+@app.route('/api/players/stats', methods=['GET'])
+def api_players_stats():
+    return get_players_stats()
 
 def main():
     """
     Main function to execute the player codes loading process
     """
+    # Imported here so API workers that only serve main:app don't load the scraper
+    from football import load_player_codes, load_player_codes_status_reset, load_player
+
     try:
         # # First load player codes
         load_player_codes()
@@ -0,0 +1,410 @@
+### Crawl metrics: per-run and per-letter timings, Prometheus export and reports ###
+import argparse
+import glob
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+METRICS_DIR = os.getenv("METRICS_DIR", "metrics")
+METRICS_FILE = "crawl.prom"
+
+# Phases and counters kept for every letter
+PHASES = ("fetch", "parse", "db")
+COUNTERS = ("rows", "retries", "bytes")
+
+
+def create_metrics_tables(cursor):
+    """
+    Create the crawl_runs and crawl_letter_metrics tables
+
+    crawl_runs holds one row per load_player_codes/load_player call with
+    its totals; crawl_letter_metrics one row per letter handled in it.
+    Times are unix seconds, durations seconds.
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS crawl_runs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        stage TEXT NOT NULL,
+        worker_id TEXT,
+        source TEXT NOT NULL DEFAULT 'live',
+        started_at REAL NOT NULL,
+        finished_at REAL,
+        letters INTEGER NOT NULL DEFAULT 0,
+        rows INTEGER NOT NULL DEFAULT 0,
+        retries INTEGER NOT NULL DEFAULT 0,
+        bytes INTEGER NOT NULL DEFAULT 0,
+        errors INTEGER NOT NULL DEFAULT 0,
+        fetch_seconds REAL NOT NULL DEFAULT 0,
+        parse_seconds REAL NOT NULL DEFAULT 0,
+        db_seconds REAL NOT NULL DEFAULT 0
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS crawl_letter_metrics (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_id INTEGER NOT NULL,
+        letter TEXT NOT NULL,
+        outcome TEXT NOT NULL,
+        fetch_seconds REAL,
+        parse_seconds REAL,
+        db_seconds REAL,
+        rows INTEGER,
+        retries INTEGER,
+        bytes INTEGER,
+        recorded_at REAL NOT NULL,
+        FOREIGN KEY (run_id) REFERENCES crawl_runs(id)
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_crawl_letter_metrics_run ON crawl_letter_metrics(run_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_crawl_letter_metrics_letter ON crawl_letter_metrics(letter, recorded_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_crawl_runs_stage ON crawl_runs(stage, finished_at)")
+
+
+class CrawlMetrics:
+    """
+    Collects the metrics of one crawl run
+
+    record_letter() only executes an INSERT, so the caller can put it in the
+    transaction that saves the letter; finish() writes the run totals and
+    refreshes the Prometheus file.
+    """
+
+    def __init__(self, conn, stage, worker_id=None, source='live', started_at=None):
+        self.conn = conn
+        self.stage = stage
+        self.totals = {'letters': 0, 'errors': 0, **{name: 0 for name in COUNTERS},
+                       **{f'{phase}_seconds': 0.0 for phase in PHASES}}
+
+        cursor = conn.cursor()
+        create_metrics_tables(cursor)
+        cursor.execute("""
+            INSERT INTO crawl_runs (stage, worker_id, source, started_at)
+            VALUES (?, ?, ?, ?)
+        """, (stage, worker_id, source, started_at or time.time()))
+        self.run_id = cursor.lastrowid
+        conn.commit()
+
+    def record_letter(self, cursor, letter, outcome, fetch_seconds=None, parse_seconds=None, db_seconds=None,
+                      rows=0, retries=0, bytes=0, recorded_at=None):
+        """
+        Record one letter; does not commit
+
+        Args:
+            cursor: Cursor of the transaction the letter is saved in
+            letter (str): Letter code, e.g. 'Ab' ('index' for the player codes page)
+            outcome (str): 'saved', 'unchanged', 'empty' or 'failed'
+            fetch_seconds (float): Network time of the successful attempt
+            parse_seconds (float): HTML parse time
+            db_seconds (float): Time spent writing the letter's rows
+            rows (int): Parsed rows
+            retries (int): Attempts beyond the first
+            bytes (int): Body bytes downloaded (0 when the cache answered)
+        """
+        cursor.execute("""
+            INSERT INTO crawl_letter_metrics (run_id, letter, outcome, fetch_seconds, parse_seconds,
+                                              db_seconds, rows, retries, bytes, recorded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (self.run_id, letter, outcome, fetch_seconds, parse_seconds, db_seconds,
+              rows, retries, bytes, recorded_at or time.time()))
+
+        self.totals['letters'] += 1
+        if outcome == 'failed':
+            self.totals['errors'] += 1
+        for name, value in (('rows', rows), ('retries', retries), ('bytes', bytes)):
+            self.totals[name] += value or 0
+        for phase, value in zip(PHASES, (fetch_seconds, parse_seconds, db_seconds)):
+            self.totals[f'{phase}_seconds'] += value or 0.0
+
+    def finish(self, finished_at=None, export=True):
+        """Save the run totals and rewrite the Prometheus file"""
+        cursor = self.conn.cursor()
+        cursor.execute("""
+            UPDATE crawl_runs
+            SET finished_at = ?, letters = ?, rows = ?, retries = ?, bytes = ?, errors = ?,
+                fetch_seconds = ?, parse_seconds = ?, db_seconds = ?
+            WHERE id = ?
+        """, (finished_at or time.time(), self.totals['letters'], self.totals['rows'], self.totals['retries'],
+              self.totals['bytes'], self.totals['errors'], self.totals['fetch_seconds'],
+              self.totals['parse_seconds'], self.totals['db_seconds'], self.run_id))
+        self.conn.commit()
+
+        if export:
+            write_prometheus(self.conn)
+
+
+def write_prometheus(conn, path=None):
+    """
+    Write the latest live run of every stage in Prometheus text format
+
+    Meant for the node_exporter textfile collector; the file is replaced
+    atomically so a scrape never sees half of it.
+
+    Args:
+        conn: Database connection
+        path (str): Output file (default: METRICS_DIR/crawl.prom)
+    """
+    path = path or os.path.join(METRICS_DIR, METRICS_FILE)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT r.stage, r.started_at, r.finished_at, r.letters, r.rows, r.retries, r.bytes, r.errors,
+               r.fetch_seconds, r.parse_seconds, r.db_seconds
+        FROM crawl_runs r
+        WHERE r.source = 'live' AND r.finished_at IS NOT NULL
+        AND r.id = (SELECT MAX(id) FROM crawl_runs
+                    WHERE stage = r.stage AND source = 'live' AND finished_at IS NOT NULL)
+        ORDER BY r.stage
+    """)
+    runs = cursor.fetchall()
+
+    gauges = [
+        ('crawl_last_run_timestamp_seconds', 'Unix time the last run finished'),
+        ('crawl_last_run_duration_seconds', 'Wall time of the last run'),
+        ('crawl_last_run_letters', 'Letters handled in the last run'),
+        ('crawl_last_run_rows', 'Rows parsed in the last run'),
+        ('crawl_last_run_retries', 'Retried attempts in the last run'),
+        ('crawl_last_run_bytes', 'Bytes downloaded in the last run'),
+        ('crawl_last_run_errors', 'Letters that failed in the last run'),
+        ('crawl_last_run_rows_per_second', 'Rows parsed per second of wall time in the last run'),
+    ]
+    lines = []
+    for name, help_text in gauges:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for stage, started_at, finished_at, letters, rows, retries, bytes_, errors, *_ in runs:
+            duration = max(finished_at - started_at, 0.0)
+            value = {
+                'crawl_last_run_timestamp_seconds': finished_at,
+                'crawl_last_run_duration_seconds': duration,
+                'crawl_last_run_letters': letters,
+                'crawl_last_run_rows': rows,
+                'crawl_last_run_retries': retries,
+                'crawl_last_run_bytes': bytes_,
+                'crawl_last_run_errors': errors,
+                'crawl_last_run_rows_per_second': rows / duration if duration else 0.0,
+            }[name]
+            lines.append(f'{name}{{stage="{stage}"}} {value}')
+
+    lines.append('# HELP crawl_last_run_phase_seconds Summed per-letter time by phase in the last run')
+    lines.append('# TYPE crawl_last_run_phase_seconds gauge')
+    for stage, *_, fetch_seconds, parse_seconds, db_seconds in runs:
+        for phase, value in zip(PHASES, (fetch_seconds, parse_seconds, db_seconds)):
+            lines.append(f'crawl_last_run_phase_seconds{{stage="{stage}",phase="{phase}"}} {value}')
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.tmp', 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(path + '.tmp', path)
+    return path
+
+
+# Lines of the pre-JSON text logs, e.g. "[2025-05-19 06:57:20] Found 83 players for letter code Aa"
+LOG_LINE = re.compile(r'^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (.*)$')
+RUN_START = re.compile(r'^Processing (\d+) player codes')
+LETTER_ATTEMPT = re.compile(r'^Processing letter code: (\S+) \(ID: \d+\) - Attempt (\d+)')
+LETTER_FOUND = re.compile(r'^Found (\d+) players for letter code (\S+)')
+LETTER_SAVED = re.compile(r'^Updated status for letter (\S+)')
+
+
+def parse_log_runs(lines):
+    """
+    Rebuild crawl runs from the lines of a legacy text log
+
+    The old crawler handled letters one after another, so the time between
+    "Processing letter code" and "Found N players" is fetch plus parse, and
+    the time up to "Updated status" the DB write. Timestamps are whole
+    seconds and parse time is not separable, so it is left empty.
+
+    Returns:
+        list: [{'started_at', 'finished_at', 'letters': [{'letter', 'outcome', 'fetch_seconds',
+               'db_seconds', 'rows', 'retries', 'recorded_at'}, ...]}, ...]
+    """
+    runs = []
+    run = None
+    current = None
+
+    for line in lines:
+        match = LOG_LINE.match(line.strip())
+        if not match:
+            continue
+        ts = datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S').timestamp()
+        message = match.group(2)
+
+        if RUN_START.match(message):
+            run = {'started_at': ts, 'finished_at': ts, 'letters': []}
+            runs.append(run)
+            current = None
+            continue
+        if run is None:
+            continue
+        run['finished_at'] = ts
+
+        if match := LETTER_ATTEMPT.match(message):
+            letter, attempt = match.group(1), int(match.group(2))
+            if current is None or current['letter'] != letter or current['outcome'] != 'pending':
+                current = {'letter': letter, 'outcome': 'pending', 'started_at': ts, 'found_at': None,
+                           'fetch_seconds': None, 'db_seconds': None, 'rows': 0, 'retries': 0,
+                           'recorded_at': ts}
+                run['letters'].append(current)
+            current['retries'] = attempt - 1
+        elif current is None:
+            continue
+        elif match := LETTER_FOUND.match(message):
+            current['rows'] = int(match.group(1))
+            current['found_at'] = ts
+            current['fetch_seconds'] = ts - current['started_at']
+            current['recorded_at'] = ts
+            if current['rows'] == 0:
+                current['outcome'] = 'empty'
+        elif match := LETTER_SAVED.match(message):
+            current['outcome'] = 'saved'
+            current['db_seconds'] = ts - (current['found_at'] or ts)
+            current['recorded_at'] = ts
+        elif message.startswith('Failed to process letter'):
+            current['outcome'] = 'failed'
+            current['recorded_at'] = ts
+
+    for run in runs:
+        for letter in run['letters']:
+            # A run that died mid-letter (e.g. "Error in load_player") never finished it
+            if letter['outcome'] == 'pending':
+                letter['outcome'] = 'failed'
+            letter.pop('started_at')
+            letter.pop('found_at')
+    return runs
+
+
+def backfill_from_logs(conn, paths):
+    """
+    Load legacy text logs into the metrics tables
+
+    Each file replaces the runs previously backfilled from it, so running
+    the backfill twice does not double count.
+
+    Args:
+        conn: Database connection
+        paths (list): Log files, e.g. glob('log/*.log')
+
+    Returns:
+        int: Number of runs loaded
+    """
+    cursor = conn.cursor()
+    create_metrics_tables(cursor)
+    loaded = 0
+
+    for path in sorted(paths):
+        source = f'log:{os.path.basename(path)}'
+        cursor.execute("""
+            DELETE FROM crawl_letter_metrics
+            WHERE run_id IN (SELECT id FROM crawl_runs WHERE source = ?)
+        """, (source,))
+        cursor.execute("DELETE FROM crawl_runs WHERE source = ?", (source,))
+        conn.commit()
+
+        with open(path, encoding='utf-8', errors='replace') as f:
+            runs = parse_log_runs(f)
+
+        for run in runs:
+            metrics = CrawlMetrics(conn, 'players', source=source, started_at=run['started_at'])
+            for letter in run['letters']:
+                metrics.record_letter(cursor, **letter)
+            metrics.finish(finished_at=run['finished_at'], export=False)
+            loaded += 1
+        print(f"{path}: {len(runs)} run(s)")
+
+    return loaded
+
+
+def report(conn, runs=10, slowest=10):
+    """Print recent runs, the slowest letters of the last run and letters getting slower"""
+    cursor = conn.cursor()
+    create_metrics_tables(cursor)
+
+    cursor.execute("""
+        SELECT id, stage, source, started_at, finished_at, letters, rows, retries, bytes, errors,
+               fetch_seconds, parse_seconds, db_seconds
+        FROM crawl_runs
+        WHERE finished_at IS NOT NULL
+        ORDER BY started_at DESC
+        LIMIT ?
+    """, (runs,))
+    recent = cursor.fetchall()
+    if not recent:
+        print("No crawl metrics recorded yet")
+        return
+
+    print(f"{'run':>5} {'stage':<12} {'started':<19} {'secs':>8} {'letters':>7} {'rows':>7} {'rows/s':>7} "
+          f"{'retries':>7} {'errors':>6} {'MB':>7} {'fetch':>8} {'parse':>7} {'db':>7}  source")
+    for (run_id, stage, source, started_at, finished_at, letters, rows, retries, bytes_, errors,
+         fetch_seconds, parse_seconds, db_seconds) in recent:
+        duration = finished_at - started_at
+        print(f"{run_id:>5} {stage:<12} {datetime.fromtimestamp(started_at):%Y-%m-%d %H:%M:%S} {duration:>8.1f} "
+              f"{letters:>7} {rows:>7} {rows / duration if duration else 0:>7.1f} {retries:>7} {errors:>6} "
+              f"{bytes_ / 1e6:>7.2f} {fetch_seconds:>8.1f} {parse_seconds:>7.2f} {db_seconds:>7.2f}  {source}")
+
+    last_run = recent[0][0]
+    cursor.execute("""
+        SELECT letter, outcome, fetch_seconds, parse_seconds, db_seconds, rows, retries
+        FROM crawl_letter_metrics
+        WHERE run_id = ?
+        ORDER BY COALESCE(fetch_seconds, 0) + COALESCE(parse_seconds, 0) + COALESCE(db_seconds, 0) DESC
+        LIMIT ?
+    """, (last_run, slowest))
+    print(f"\nSlowest letters in run {last_run}:")
+    for letter, outcome, fetch_seconds, parse_seconds, db_seconds, rows, retries in cursor.fetchall():
+        print(f"  {letter:<6} {outcome:<9} fetch {fetch_seconds or 0:>7.2f}s  parse {parse_seconds or 0:>6.2f}s  "
+              f"db {db_seconds or 0:>6.2f}s  {rows or 0:>6} rows  {retries or 0} retries")
+
+    # Letters whose latest fetch took at least twice their earlier median
+    cursor.execute("""
+        SELECT letter, fetch_seconds, recorded_at FROM crawl_letter_metrics
+        WHERE outcome = 'saved' AND fetch_seconds IS NOT NULL
+        ORDER BY letter, recorded_at
+    """)
+    history = {}
+    for letter, fetch_seconds, _ in cursor.fetchall():
+        history.setdefault(letter, []).append(fetch_seconds)
+
+    regressions = []
+    for letter, values in history.items():
+        if len(values) < 3:
+            continue
+        earlier = sorted(values[:-1])
+        median = earlier[len(earlier) // 2]
+        if median > 0 and values[-1] >= 2 * median and values[-1] - median >= 1:
+            regressions.append((values[-1] / median, letter, values[-1], median))
+
+    if regressions:
+        print("\nLetters slower than usual (latest fetch vs. earlier median):")
+        for ratio, letter, latest, median in sorted(regressions, reverse=True)[:slowest]:
+            print(f"  {letter:<6} {latest:>7.2f}s vs {median:>6.2f}s  ({ratio:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl metrics report and legacy log backfill")
+    parser.add_argument('--db', default="./data/football.db", help="SQLite database path")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    report_parser = commands.add_parser('report', help="Show recent runs and slow letters")
+    report_parser.add_argument('--runs', type=int, default=10)
+    report_parser.add_argument('--slowest', type=int, default=10)
+
+    backfill_parser = commands.add_parser('backfill', help="Load metrics from legacy log/*.log files")
+    backfill_parser.add_argument('paths', nargs='*', help="Log files (default: log/*.log)")
+
+    commands.add_parser('export', help="Rewrite the Prometheus file from the database")
+
+    args = parser.parse_args()
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.command == 'report':
+            report(conn, runs=args.runs, slowest=args.slowest)
+        elif args.command == 'backfill':
+            paths = args.paths or glob.glob(os.path.join("log", "*.log"))
+            print(f"Backfilled {backfill_from_logs(conn, paths)} run(s)")
+        else:
+            create_metrics_tables(conn.cursor())
+            print(f"Wrote {write_prometheus(conn)}")
+    finally:
+        conn.close()
@@ -0,0 +1,436 @@
+### Read side of the players database, used by the API ###
+# Only the standard library is imported: API workers never pay for the
+# scraper's dependencies. Rows come back as plain dicts ready for the JSON encoder.
+import base64
+import json
+import sqlite3
+
+from db import get_read_pool, read_connection
+
+db_link="./data/football.db"
+
+# Sort columns allowed by get_players, mapped to their SQL expression
+SORT_COLUMNS = {
+    'id': 'p.id',
+    'name': 'p.name',
+    'years': 'p.years',
+    'position': 'p.position',
+    'additional_info': 'p.additional_info',
+    'player_code_id': 'p.player_code_id',
+    'url': 'p.url',
+    'letter': 'p.letter'  # copy of pc.letter kept on players, indexed with id
+}
+
+
+# Position codes found in players.position ("FW-MF"), one bit each in players.position_mask
+POSITION_BITS = {'GK': 1, 'DF': 2, 'MF': 4, 'FW': 8}
+
+
+def position_masks(positions):
+    """
+    Every position_mask value that includes one of the given positions
+
+    With four bits there are only 16 masks, so "is a goalkeeper" becomes
+    position_mask IN (1, 3, 5, ...), which SQLite answers from the index.
+
+    Args:
+        positions (str): Position codes, e.g. "GK" or "FW,MF" (any of them)
+
+    Returns:
+        list: Matching mask values (empty when no code is known)
+    """
+    wanted = 0
+    for code in positions.upper().replace('-', ',').split(','):
+        wanted |= POSITION_BITS.get(code.strip(), 0)
+    return [mask for mask in range(1, 1 << len(POSITION_BITS)) if mask & wanted]
+
+
+# Columns returned for every player by get_players and search_players
+PLAYER_COLUMNS = ('id', 'name', 'years', 'position', 'additional_info', 'player_code_id', 'url', 'letter')
+
+
+def player_row(cursor, row):
+    """Row factory building the player dict straight from the result tuple"""
+    return dict(zip(PLAYER_COLUMNS, row))
+
+
+def get_data_version():
+    """
+    Get the current data version, bumped by the loaders on every write
+
+    Returns:
+        int: Data version (0 if the database has never been loaded)
+    """
+    pool = get_read_pool(db_link)
+    try:
+        with pool.connection() as conn:
+            row = conn.execute("SELECT value FROM data_meta WHERE key = 'data_version'").fetchone()
+        return row[0] if row else 0
+    except sqlite3.Error:
+        return 0
+
+
+def encode_cursor(sort_value, player_id):
+    """Encode the last row of a page as an opaque keyset cursor"""
+    raw = json.dumps([sort_value, player_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a keyset cursor into (sort_value, player_id), None for the first page
+
+    Raises ValueError when the cursor was not made by encode_cursor.
+    """
+    if not cursor:
+        return None
+    try:
+        sort_value, player_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, int(player_id)
+    except (ValueError, TypeError) as e:  # binascii.Error and JSONDecodeError are ValueErrors
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def get_players(page=1, page_size=10, sort_column='id', sort_order='asc', cursor=None, position=None,
+                active_from=None, active_to=None):
+    """
+    Get player information from the players table in the database with pagination and sorting
+
+    Pass `cursor` to use keyset pagination instead of page/offset: '' for the
+    first page, then the next_cursor of the previous call. Keyset pages seek
+    straight to the sort index, so deep pages cost the same as the first one.
+
+    The filters use the parsed first_year/last_year/position_mask columns
+    and their indexes; pass the same filters with every cursor. Database
+    errors are raised, never returned as an empty page.
+    
+    Args:
+        page (int): Page number (starting from 1), ignored when cursor is given
+        page_size (int): Number of records per page
+        sort_column (str): Column to sort by
+        sort_order (str): Sort direction ('asc' or 'desc')
+        cursor (str): Keyset cursor ('' for the first page, None for offset mode)
+        position (str): Only players with one of these positions, e.g. "GK" or "FW,MF"
+        active_from (int): Only players whose career reaches this year or later
+        active_to (int): Only players whose career started by this year
+        
+    Returns:
+        tuple: (list of player dicts, total_records) in offset mode,
+            (list of player dicts, total_records, next_cursor) in keyset mode
+    """
+    pool = get_read_pool(db_link)
+
+    try:
+        # Borrow a read-only connection from the shared pool
+        conn = pool.acquire()
+        db_cursor = conn.cursor()
+
+        # Validate and sanitize inputs to prevent SQL injection
+        if sort_column not in SORT_COLUMNS:
+            sort_column = 'id'  # Default to id if invalid column
+        sort_expression = SORT_COLUMNS[sort_column]
+            
+        sort_direction = 'DESC' if sort_order.lower() == 'desc' else 'ASC'
+
+        # id breaks ties so the order is stable and matches the (column, id) indexes
+        order_by = f"{sort_expression} {sort_direction}"
+        if sort_column != 'id':
+            order_by += f", p.id {sort_direction}"
+        
+        # Filters on the parsed, indexed columns
+        filters = []
+        filter_params = []
+        if position:
+            masks = position_masks(position) or [-1]
+            filters.append(f"p.position_mask IN ({', '.join('?' * len(masks))})")
+            filter_params.extend(masks)
+        if active_from is not None:
+            filters.append("p.last_year >= ?")
+            filter_params.append(active_from)
+        if active_to is not None:
+            filters.append("p.first_year <= ?")
+            filter_params.append(active_to)
+
+        if filters:
+            # Filtered totals are counted over the same indexes
+            db_cursor.execute(f"SELECT COUNT(*) FROM players p WHERE {' AND '.join(filters)}", filter_params)
+            total_records = db_cursor.fetchone()[0]
+        else:
+            # Get total count from the maintained counter, fall back to COUNT(*) on old databases
+            try:
+                db_cursor.execute("SELECT row_count FROM table_counts WHERE name = 'players'")
+                count_row = db_cursor.fetchone()
+            except sqlite3.OperationalError:
+                count_row = None
+            if count_row is None:
+                db_cursor.execute("SELECT COUNT(*) FROM players")
+                count_row = db_cursor.fetchone()
+            total_records = count_row[0]
+
+        # Query to get paginated players from the database
+        query = f"""
+        SELECT p.id, p.name, p.years, p.position, p.additional_info, 
+            p.player_code_id, p.url, pc.letter
+        FROM players p
+        JOIN player_codes pc ON p.player_code_id = pc.id
+        """
+
+        conditions = list(filters)
+        params = list(filter_params)
+        if cursor is not None:
+            # Seek past the last row of the previous page
+            after = decode_cursor(cursor)
+            if after is not None:
+                comparison = '<' if sort_direction == 'DESC' else '>'
+                if sort_column == 'id':
+                    conditions.append(f"p.id {comparison} ?")
+                    params.append(after[1])
+                else:
+                    conditions.append(f"({sort_expression}, p.id) {comparison} (?, ?)")
+                    params.extend(after)
+        if conditions:
+            query += f"WHERE {' AND '.join(conditions)} "
+
+        if cursor is None:
+            # Calculate offset
+            offset = (page - 1) * page_size
+            query += f"ORDER BY {order_by} LIMIT ? OFFSET ?"
+            params.extend((page_size, offset))
+        else:
+            query += f"ORDER BY {order_by} LIMIT ?"
+            params.append(page_size)
+        
+        # Execute the query with parameters; rows come back as player dicts
+        db_cursor.row_factory = player_row
+        db_cursor.execute(query, params)
+        players_data = db_cursor.fetchall()
+
+        if cursor is None:
+            print(f"Retrieved {len(players_data)} players from database (page {page})")
+            return players_data, total_records
+
+        # A full page means there may be more rows after its last one
+        next_cursor = None
+        if len(players_data) == page_size:
+            last = players_data[-1]
+            next_cursor = encode_cursor(last[sort_column], last['id'])
+        print(f"Retrieved {len(players_data)} players from database (cursor)")
+        return players_data, total_records, next_cursor
+        
+    except Exception as e:
+        # Re-raised so callers never mistake a failed read for an empty page (and cache it)
+        print(f"Error in get_players: {e}")
+        raise
+
+    finally:
+        if 'conn' in locals():
+            db_cursor.close()
+            pool.release(conn)
+
+
+def search_players(query, page=1, page_size=10):
+    """
+    Full-text search over player name, position and additional info
+
+    Every word of the query must match, as a prefix; results are ranked
+    by bm25 with name matches weighted highest. Database errors are
+    raised, never returned as no matches.
+
+    Args:
+        query (str): Search text, e.g. "ronal FW"
+        page (int): Page number (starting from 1)
+        page_size (int): Number of records per page
+
+    Returns:
+        tuple: (list of player dicts, total_matches)
+    """
+    # Quote every word so user input can't inject FTS5 query syntax
+    terms = [word.replace('"', '') for word in query.split()]
+    match = ' '.join(f'"{term}"*' for term in terms if term)
+    if not match:
+        return [], 0
+
+    pool = get_read_pool(db_link)
+
+    try:
+        # Borrow a read-only connection from the shared pool
+        conn = pool.acquire()
+        db_cursor = conn.cursor()
+
+        db_cursor.execute("SELECT COUNT(*) FROM players_fts WHERE players_fts MATCH ?", (match,))
+        total_matches = db_cursor.fetchone()[0]
+
+        offset = (page - 1) * page_size
+        db_cursor.row_factory = player_row
+        db_cursor.execute("""
+        SELECT p.id, p.name, p.years, p.position, p.additional_info, 
+            p.player_code_id, p.url, pc.letter
+        FROM players_fts f
+        JOIN players p ON p.id = f.rowid
+        JOIN player_codes pc ON p.player_code_id = pc.id
+        WHERE players_fts MATCH ?
+        ORDER BY bm25(players_fts, 10.0, 5.0, 2.0, 1.0), p.id
+        LIMIT ? OFFSET ?
+        """, (match, page_size, offset))
+        players_data = db_cursor.fetchall()
+
+        print(f"Found {total_matches} players for search '{query}' (page {page})")
+        return players_data, total_matches
+
+    except Exception as e:
+        # Re-raised so callers never mistake a failed read for no matches (and cache it)
+        print(f"Error in search_players: {e}")
+        raise
+
+    finally:
+        if 'conn' in locals():
+            db_cursor.close()
+            pool.release(conn)
+
+
+def get_player_codes():
+    """
+    Get the letter codes of the players index
+
+    Returns:
+        list: [{'id', 'letter', 'url', 'status'}, ...] in letter order
+    """
+    pool = get_read_pool(db_link)
+
+    try:
+        # Borrow a read-only connection from the shared pool
+        conn = pool.acquire()
+        db_cursor = conn.cursor()
+        db_cursor.execute("SELECT id, letter, url, status FROM player_codes ORDER BY letter, id")
+        return [
+            {'id': code_id, 'letter': letter, 'url': url, 'status': bool(status)}
+            for code_id, letter, url, status in db_cursor
+        ]
+
+    except Exception as e:
+        print(f"Error in get_player_codes: {e}")
+        return []
+
+    finally:
+        if 'conn' in locals():
+            db_cursor.close()
+            pool.release(conn)
+
+
+def get_player_stats(dimension=None):
+    """
+    Player counts per position, letter and career decade
+
+    Read from the player_stats summary table kept up to date by triggers,
+    so the cost does not grow with the players table. Database errors are
+    raised, never returned as empty counts.
+
+    Args:
+        dimension (str): Only this dimension ('position', 'letter' or 'decade')
+
+    Returns:
+        dict: {dimension: {value: player_count}}; '' is the value for players without one
+    """
+    pool = get_read_pool(db_link)
+
+    try:
+        # Borrow a read-only connection from the shared pool
+        conn = pool.acquire()
+        db_cursor = conn.cursor()
+
+        if dimension:
+            db_cursor.execute("SELECT dimension, value, player_count FROM player_stats WHERE dimension = ?",
+                              (dimension,))
+        else:
+            db_cursor.execute("SELECT dimension, value, player_count FROM player_stats")
+
+        stats = {}
+        for row_dimension, value, player_count in db_cursor:
+            stats.setdefault(row_dimension, {})[value] = player_count
+        return stats
+
+    except Exception as e:
+        # Re-raised so the endpoint never caches an empty result for a failed read
+        print(f"Error in get_player_stats: {e}")
+        raise
+
+    finally:
+        if 'conn' in locals():
+            db_cursor.close()
+            pool.release(conn)
+
+
+# Columns written by iter_players: the player with its biography and letter code
+EXPORT_COLUMNS = ('id', 'name', 'other_name', 'date_of_birth', 'place_of_birth', 'height', 'weight',
+                  'nationality', 'club', 'league', 'years', 'position', 'additional_info', 'about',
+                  'player_code_id', 'letter', 'url', 'updated_at')
+EXPORT_CHUNK_ROWS = 2000
+
+
+def iter_players(letter=None, position=None, nationality=None, updated_since=None, after_id=None, limit=None,
+                 chunk_size=EXPORT_CHUNK_ROWS, db_path=None):
+    """
+    Stream every player matching the filters, in id order
+
+    One query is run and read with fetchmany, so memory stays at one chunk
+    whatever the table size. It reads over a connection of its own, closed
+    when the generator is exhausted or closed, so long downloads never take
+    connections from the API pool.
+
+    Args:
+        letter (str): Letter code, e.g. 'Ab'
+        position (str): Position code; matches 'FW' in 'MF-FW'
+        nationality (str): Exact nationality
+        updated_since (str): Only players updated at or after this timestamp ('YYYY-MM-DD[ HH:MM:SS]')
+        after_id (int): Resume after this player id
+        limit (int): Max players
+        chunk_size (int): Rows per fetchmany
+        db_path (str): Database to read (default: db_link)
+
+    Yields:
+        list: Tuples in EXPORT_COLUMNS order, up to chunk_size per list
+    """
+    conditions = []
+    params = []
+    if letter:
+        conditions.append("pc.letter = ?")
+        params.append(letter)
+    if position:
+        conditions.append("('-' || p.position || '-') LIKE ?")
+        params.append(f"%-{position.upper()}-%")
+    if nationality:
+        conditions.append("p.nationality = ?")
+        params.append(nationality)
+    if updated_since:
+        conditions.append("COALESCE(p.updated_at, p.created_at) >= ?")
+        params.append(updated_since)
+    if after_id is not None:
+        conditions.append("p.id > ?")
+        params.append(int(after_id))
+
+    columns = ', '.join('pc.letter' if column == 'letter' else f'p.{column}' for column in EXPORT_COLUMNS)
+    query = f"""
+        SELECT {columns}
+        FROM players p
+        JOIN player_codes pc ON p.player_code_id = pc.id
+        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+        ORDER BY p.id
+    """
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(int(limit))
+
+    try:
+        # A connection of its own: a slow download must not hold one of the API pool's
+        conn = read_connection(db_path or db_link)
+        db_cursor = conn.cursor()
+        db_cursor.execute(query, params)
+        while True:
+            rows = db_cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+    finally:
+        if 'conn' in locals():
+            conn.close()
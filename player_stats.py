@@ -0,0 +1,165 @@
+### Summary counts of players, maintained incrementally by triggers ###
+import argparse
+import sqlite3
+
+# SQL for the value each dimension groups by, given the row alias (new, old or p)
+STATS_DIMENSIONS = {
+    'position': "COALESCE({row}.position, '')",
+    'letter': "COALESCE({row}.letter, '')",
+}
+
+# Career span from years ("1995-2012" or "2019"): a player counts once in
+# every decade of the career, under the 'decade' dimension ('1990s', ...)
+FIRST_YEAR = ("(CASE WHEN substr({row}.years, 1, 4) GLOB '[0-9][0-9][0-9][0-9]' "
+              "THEN CAST(substr({row}.years, 1, 4) AS INTEGER) END)")
+LAST_YEAR = ("(CASE WHEN substr({row}.years, -4) GLOB '[0-9][0-9][0-9][0-9]' "
+             "THEN CAST(substr({row}.years, -4) AS INTEGER) END)")
+DECADE_RANGE = "d.decade BETWEEN " + FIRST_YEAR + " / 10 * 10 AND COALESCE(" + LAST_YEAR + ", " + FIRST_YEAR + ")"
+DIMENSIONS = tuple(STATS_DIMENSIONS) + ('decade',)
+
+
+def stats_changes(row, delta):
+    """Statements adding delta to every summary row the player `row` (new or old) counts in"""
+    upsert = "ON CONFLICT(dimension, value) DO UPDATE SET player_count = player_count + excluded.player_count"
+    statements = [
+        f"INSERT INTO player_stats (dimension, value, player_count) "
+        f"SELECT '{dimension}', {expression.format(row=row)}, {delta} WHERE true {upsert};"
+        for dimension, expression in STATS_DIMENSIONS.items()
+    ]
+    statements.append(
+        f"INSERT INTO player_stats (dimension, value, player_count) "
+        f"SELECT 'decade', d.decade || 's', {delta} FROM stats_decades d "
+        f"WHERE {DECADE_RANGE.format(row=row)} {upsert};"
+    )
+    statements.append(
+        f"INSERT INTO player_stats (dimension, value, player_count) "
+        f"SELECT 'decade', '', {delta} WHERE {FIRST_YEAR.format(row=row)} IS NULL {upsert};"
+    )
+    return '\n'.join(statements)
+
+
+def create_player_stats(conn):
+    """
+    Create the player_stats summary table and the triggers that maintain it
+
+    One row per (dimension, value) with the number of players in it, for
+    the position, letter and decade dimensions. Insert, delete and update
+    triggers on players adjust only the affected rows, so a stats read is
+    a primary key range scan whatever the size of players. The first time
+    it is created it is filled from the rows already in players.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'player_stats'")
+    exists = cursor.fetchone() is not None
+
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS player_stats (
+        dimension TEXT NOT NULL,
+        value TEXT NOT NULL,
+        player_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (dimension, value)
+    ) WITHOUT ROWID
+    ''')
+    # Decades a career can span, joined against by the triggers
+    cursor.execute("CREATE TABLE IF NOT EXISTS stats_decades (decade INTEGER PRIMARY KEY)")
+    cursor.executemany("INSERT OR IGNORE INTO stats_decades (decade) VALUES (?)",
+                       [(decade,) for decade in range(1850, 2100, 10)])
+
+    # Recreated every time, so databases created with older definitions get the current ones
+    for trigger in ('players_stats_insert', 'players_stats_delete', 'players_stats_update'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    cursor.execute(f"""
+        CREATE TRIGGER players_stats_insert AFTER INSERT ON players
+        BEGIN
+            {stats_changes('new', 1)}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER players_stats_delete AFTER DELETE ON players
+        BEGIN
+            {stats_changes('old', -1)}
+            DELETE FROM player_stats WHERE player_count <= 0;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER players_stats_update AFTER UPDATE OF position, years, player_code_id, letter ON players
+        WHEN old.position IS NOT new.position OR old.years IS NOT new.years
+            OR old.player_code_id IS NOT new.player_code_id OR old.letter IS NOT new.letter
+        BEGIN
+            {stats_changes('old', -1)}
+            {stats_changes('new', 1)}
+            DELETE FROM player_stats WHERE player_count <= 0;
+        END
+    """)
+
+    if not exists:
+        rebuild_player_stats(cursor)
+    conn.commit()
+
+
+def computed_stats_query():
+    """SELECT of (dimension, value, player_count) computed from players with GROUP BYs"""
+    selects = [
+        f"SELECT '{dimension}', {expression.format(row='p')}, COUNT(*) FROM players p GROUP BY 2"
+        for dimension, expression in STATS_DIMENSIONS.items()
+    ]
+    selects.append(
+        f"SELECT 'decade', d.decade || 's', COUNT(*) FROM players p JOIN stats_decades d "
+        f"ON {DECADE_RANGE.format(row='p')} GROUP BY d.decade"
+    )
+    selects.append(f"SELECT 'decade', '', COUNT(*) FROM players p WHERE {FIRST_YEAR.format(row='p')} IS NULL "
+                   f"HAVING COUNT(*) > 0")
+    return '\nUNION ALL\n'.join(selects)
+
+
+def rebuild_player_stats(cursor):
+    """Recompute player_stats from players with full-table GROUP BYs; call inside a transaction"""
+    cursor.execute("DELETE FROM player_stats")
+    cursor.execute(f"INSERT INTO player_stats (dimension, value, player_count) {computed_stats_query()}")
+
+
+def check_player_stats(conn):
+    """
+    Compare player_stats with counts computed from scratch
+
+    Returns:
+        list: [(dimension, value, stored_count, actual_count), ...] for every row that differs
+    """
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        WITH actual (dimension, value, player_count) AS ({computed_stats_query()})
+        SELECT COALESCE(s.dimension, a.dimension), COALESCE(s.value, a.value),
+               COALESCE(s.player_count, 0), COALESCE(a.player_count, 0)
+        FROM player_stats s
+        LEFT JOIN actual a ON a.dimension = s.dimension AND a.value = s.value
+        WHERE a.player_count IS NOT s.player_count
+        UNION ALL
+        SELECT a.dimension, a.value, 0, a.player_count
+        FROM actual a
+        WHERE NOT EXISTS (SELECT 1 FROM player_stats s WHERE s.dimension = a.dimension AND s.value = a.value)
+    """)
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check or rebuild the player_stats summary table")
+    parser.add_argument('command', choices=['check', 'rebuild'])
+    parser.add_argument('--db', default="./data/football.db", help="SQLite database path")
+    parser.add_argument('--fix', action='store_true', help="Rebuild when check finds differences")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    try:
+        create_player_stats(conn)
+        if args.command == 'check':
+            differences = check_player_stats(conn)
+            for dimension, value, stored, actual in differences:
+                print(f"{dimension:<9} {value or '(unknown)':<20} stored {stored:>8}  actual {actual:>8}")
+            print(f"{len(differences)} summary row(s) differ")
+        if args.command == 'rebuild' or (args.fix and differences):
+            cursor = conn.cursor()
+            rebuild_player_stats(cursor)
+            conn.commit()
+            print("player_stats rebuilt")
+    finally:
+        conn.close()
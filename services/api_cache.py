@@ -0,0 +1,157 @@
+### Response cache for the API-Sports client ###
+import json
+import os
+import sqlite3
+import threading
+import time
+
+API_CACHE_DB = os.getenv("API_CACHE_DB", "cache/api.db")
+API_CACHE_MODE = os.getenv("API_CACHE_MODE", "on")  # on or off
+
+# Seconds a response stays fresh, per endpoint; fixtures are usually called for live scores
+API_CACHE_TTL = {
+    'fixtures': 15,
+    'players': 24 * 3600,
+}
+API_CACHE_DEFAULT_TTL = 3600
+
+
+def cache_key(endpoint, params):
+    """Endpoint plus its parameters in a canonical order"""
+    return endpoint + '?' + json.dumps(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+
+
+class ApiCache:
+    """
+    TTL cache of decoded API responses, in SQLite so it outlives the process
+
+    A response younger than its TTL is served without calling the API.
+    With stale_while_revalidate, a response up to that many seconds past
+    its TTL is served immediately while one background call refreshes it.
+    Concurrent calls for the same key share one upstream request, and a
+    stale copy is served when the refresh fails (e.g. the quota is spent).
+    """
+
+    def __init__(self, db_path=API_CACHE_DB):
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS api_cache (
+            key TEXT PRIMARY KEY,
+            endpoint TEXT NOT NULL,
+            body TEXT NOT NULL,
+            fetched_at REAL NOT NULL
+        )
+        ''')
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.in_flight = {}  # key -> Event set when its upstream call finishes
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    def lookup(self, key):
+        """(decoded body, age in seconds) for key, or None"""
+        with self.lock:
+            row = self.conn.execute("SELECT body, fetched_at FROM api_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), time.time() - row[1]
+
+    def store(self, key, endpoint, result):
+        with self.lock:
+            self.conn.execute("""
+                INSERT INTO api_cache (key, endpoint, body, fetched_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET body = excluded.body, fetched_at = excluded.fetched_at
+            """, (key, endpoint, json.dumps(result, ensure_ascii=False), time.time()))
+            self.conn.commit()
+
+    def fetch_once(self, key, endpoint, fetch):
+        """
+        Call fetch() and store its result, unless the same key is already
+        being fetched, in which case wait for that call and use its result
+        """
+        with self.lock:
+            event = self.in_flight.get(key)
+            leader = event is None
+            if leader:
+                event = self.in_flight[key] = threading.Event()
+
+        if not leader:
+            event.wait()
+            cached = self.lookup(key)
+            if cached is None:
+                raise RuntimeError(f"Concurrent request for {key} failed")
+            return cached[0]
+
+        try:
+            result = fetch()
+            self.store(key, endpoint, result)
+            return result
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            event.set()
+
+    def get(self, endpoint, params, fetch, ttl=None, stale_while_revalidate=0, serve_stale_on_error=True):
+        """
+        Cached result of fetch() for endpoint and params
+
+        Args:
+            endpoint (str): API endpoint, e.g. 'fixtures'
+            params (dict): Query parameters
+            fetch (callable): Calls the API and returns the decoded body
+            ttl (int): Seconds the response stays fresh (default: API_CACHE_TTL for the endpoint)
+            stale_while_revalidate (int): Seconds past ttl a stale response is still
+                served while it is refreshed in the background
+            serve_stale_on_error (bool): Return the cached copy, however old, when fetch() fails;
+                when False the error is raised
+
+        Returns:
+            dict: Decoded response body
+        """
+        ttl = API_CACHE_TTL.get(endpoint, API_CACHE_DEFAULT_TTL) if ttl is None else ttl
+        key = cache_key(endpoint, params)
+        cached = self.lookup(key)
+
+        if cached is not None:
+            body, age = cached
+            if age < ttl:
+                self.hits += 1
+                return body
+            if age < ttl + stale_while_revalidate:
+                self.stale_hits += 1
+                self.refresh_in_background(key, endpoint, fetch)
+                return body
+
+        self.misses += 1
+        try:
+            return self.fetch_once(key, endpoint, fetch)
+        except Exception:
+            if cached is not None and serve_stale_on_error:
+                # Better an old answer than none when the API or the quota refuses
+                return cached[0]
+            raise
+
+    def refresh_in_background(self, key, endpoint, fetch):
+        with self.lock:
+            if key in self.in_flight:
+                return
+
+        def refresh():
+            try:
+                self.fetch_once(key, endpoint, fetch)
+            except Exception as e:
+                print(f"Error refreshing {key}: {e}")
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def purge(self, older_than):
+        """Delete responses fetched more than older_than seconds ago"""
+        with self.lock:
+            self.conn.execute("DELETE FROM api_cache WHERE fetched_at < ?", (time.time() - older_than,))
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,151 @@
+### Request budget for the API-Sports plan ###
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+API_QUOTA_DB = os.getenv("API_QUOTA_DB", "cache/api.db")
+API_DAILY_LIMIT = int(os.getenv("API_DAILY_LIMIT", "100"))    # until the API reports the plan's limit
+API_MINUTE_LIMIT = int(os.getenv("API_MINUTE_LIMIT", "10"))
+API_DAILY_RESERVE = int(os.getenv("API_DAILY_RESERVE", "0"))  # requests always kept spare
+
+
+class QuotaExceededError(Exception):
+    """The daily request budget is spent; calls are refused until it resets at 00:00 UTC"""
+
+
+def header_int(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+class QuotaLedger:
+    """
+    Persistent count of the requests sent today, checked before every call
+
+    Requests are counted locally as they are sent and corrected from the
+    rate-limit headers of every response (x-ratelimit-requests-limit and
+    -remaining for the day, X-RateLimit-Limit and -Remaining for the
+    minute), so several processes sharing the key stay within the plan.
+    The day's count lives in SQLite and survives restarts; the minute
+    window is kept in memory.
+    """
+
+    def __init__(self, db_path=API_QUOTA_DB, daily_limit=API_DAILY_LIMIT, minute_limit=API_MINUTE_LIMIT,
+                 reserve=API_DAILY_RESERVE):
+        self.daily_limit = daily_limit
+        self.minute_limit = minute_limit
+        self.reserve = reserve
+        self.sent = deque()  # monotonic times of the requests of the last minute
+        self.lock = threading.Lock()
+
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS api_quota (
+            day TEXT PRIMARY KEY,
+            used INTEGER NOT NULL DEFAULT 0,
+            daily_limit INTEGER,
+            minute_limit INTEGER,
+            updated_at TIMESTAMP
+        )
+        ''')
+        self.conn.commit()
+
+    @staticmethod
+    def today():
+        # The API-Sports day resets at midnight UTC
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+    def usage(self):
+        """
+        Today's usage
+
+        Returns:
+            dict: day, used, daily_limit, remaining, minute_limit, minute_used
+        """
+        with self.lock:
+            day = self.today()
+            row = self.conn.execute("SELECT used, daily_limit, minute_limit FROM api_quota WHERE day = ?",
+                                    (day,)).fetchone()
+            used, daily_limit, minute_limit = row or (0, None, None)
+            daily_limit = daily_limit or self.daily_limit
+            self._trim_minute()
+            return {
+                'day': day,
+                'used': used,
+                'daily_limit': daily_limit,
+                'remaining': max(0, daily_limit - used),
+                'minute_limit': minute_limit or self.minute_limit,
+                'minute_used': len(self.sent)
+            }
+
+    def _trim_minute(self):
+        now = time.monotonic()
+        while self.sent and now - self.sent[0] >= 60:
+            self.sent.popleft()
+
+    def reserve_request(self):
+        """
+        Count one request against the budget before sending it
+
+        Waits when the minute's requests are used up; raises
+        QuotaExceededError when the day's are.
+        """
+        while True:
+            with self.lock:
+                day = self.today()
+                row = self.conn.execute("SELECT used, daily_limit, minute_limit FROM api_quota WHERE day = ?",
+                                        (day,)).fetchone()
+                used, daily_limit, minute_limit = row or (0, None, None)
+                daily_limit = daily_limit or self.daily_limit
+                if used >= daily_limit - self.reserve:
+                    raise QuotaExceededError(f"Daily API quota spent: {used}/{daily_limit} requests on {day}")
+
+                self._trim_minute()
+                if len(self.sent) < (minute_limit or self.minute_limit):
+                    self.sent.append(time.monotonic())
+                    self.conn.execute("""
+                        INSERT INTO api_quota (day, used, updated_at) VALUES (?, 1, CURRENT_TIMESTAMP)
+                        ON CONFLICT(day) DO UPDATE SET used = used + 1, updated_at = CURRENT_TIMESTAMP
+                    """, (day,))
+                    self.conn.commit()
+                    return
+                wait = 60 - (time.monotonic() - self.sent[0])
+            time.sleep(max(wait, 0.05))
+
+    def record_response(self, headers):
+        """Correct the ledger from the rate-limit headers of a response"""
+        daily_limit = header_int(headers, 'x-ratelimit-requests-limit')
+        daily_remaining = header_int(headers, 'x-ratelimit-requests-remaining')
+        minute_limit = header_int(headers, 'X-RateLimit-Limit')
+        minute_remaining = header_int(headers, 'X-RateLimit-Remaining')
+
+        with self.lock:
+            day = self.today()
+            if daily_limit is not None:
+                self.conn.execute("""
+                    INSERT INTO api_quota (day, used, daily_limit, updated_at) VALUES (?, 0, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(day) DO UPDATE SET daily_limit = excluded.daily_limit, updated_at = CURRENT_TIMESTAMP
+                """, (day, daily_limit))
+                if daily_remaining is not None:
+                    # Other processes may share the key: the server's count wins when it is higher
+                    self.conn.execute("UPDATE api_quota SET used = MAX(used, ?) WHERE day = ?",
+                                      (daily_limit - daily_remaining, day))
+            if minute_limit is not None:
+                self.conn.execute("UPDATE api_quota SET minute_limit = ? WHERE day = ?", (minute_limit, day))
+                if minute_remaining is not None:
+                    # Fill the window up to what the server says is already used this minute
+                    self._trim_minute()
+                    now = time.monotonic()
+                    while len(self.sent) < minute_limit - minute_remaining:
+                        self.sent.append(now)
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
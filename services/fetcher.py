@@ -0,0 +1,409 @@
+### Page fetchers for fbref.com ###
+import os
+import threading
+import time
+from urllib.parse import urljoin
+
+import requests
+from bs4 import BeautifulSoup
+from services.http_cache import CacheMissError
+from services.rate_limit import ThrottledError, parse_retry_after
+
+FETCH_BACKEND = os.getenv("FETCH_BACKEND", "http")
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", "1"))
+
+BASE_URL = "https://fbref.com"
+
+# Returned instead of page content when the server answered 304 Not Modified
+UNCHANGED = object()
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+)
+
+
+def parse_player_codes(html, base_url=BASE_URL):
+    """
+    Parse the fbref players index page into letter code links
+
+    Args:
+        html (str): Page source of https://fbref.com/en/players/
+        base_url (str): Used to make relative links absolute
+
+    Returns:
+        list: [{'letter': 'Aa', 'url': 'https://fbref.com/en/players/aa/'}, ...]
+    """
+    soup = BeautifulSoup(html, "lxml")
+    codes = []
+    seen = set()
+
+    for link in soup.find_all("a", href=True):
+        href = urljoin(base_url, link["href"])
+        text = link.get_text().strip()
+
+        # Valid letter code link: "Ab" style text, URL ending with /
+        if (text and '/en/players/' in href and
+            len(text) == 2 and
+            text[0].isalpha() and text[1].isalpha() and
+            text[0].isupper() and text[1].islower() and
+            href.endswith('/') and text not in seen):
+            seen.add(text)
+            codes.append({'letter': text, 'url': href})
+
+    return codes
+
+
+def parse_player_rows(html, base_url=BASE_URL):
+    """
+    Parse a fbref letter page into player rows
+
+    Every `.section_content p` is "Name · Years · Position [· extra]".
+
+    Args:
+        html (str): Page source of a letter page
+        base_url (str): Used to make relative links absolute
+
+    Returns:
+        list or None: Player dicts, or None if the page has no section_content
+    """
+    soup = BeautifulSoup(html, "lxml")
+    if soup.select_one(".section_content") is None:
+        return None
+
+    rows = []
+    for player_row in soup.select(".section_content p"):
+        player_text = player_row.get_text().strip()
+        if not player_text:
+            continue
+
+        parts = player_text.split('·')
+        link = player_row.find("a", href=True)
+        if len(parts) < 3 or link is None:
+            continue
+
+        rows.append({
+            'name': parts[0].strip(),
+            'years': parts[1].strip(),
+            'position': parts[2].strip(),
+            'additional_info': ' '.join(parts[3:]).strip() if len(parts) > 3 else '',
+            'url': urljoin(base_url, link["href"])
+        })
+
+    return rows
+
+
+def parse_player_details(html):
+    """
+    Parse a fbref player page into the biography columns of players
+
+    Reads the #meta block ("Born:", height/weight, "National Team:",
+    "Club:") and the competition of the latest domestic league season.
+
+    Args:
+        html (str): Page source of a player page
+
+    Returns:
+        dict or None: Biography fields (None where missing), or None if the page has no #meta
+    """
+    soup = BeautifulSoup(html, "lxml")
+    meta = soup.select_one("#meta")
+    if meta is None:
+        return None
+
+    details = {
+        'other_name': None,
+        'date_of_birth': None,
+        'place_of_birth': None,
+        'height': None,
+        'weight': None,
+        'nationality': None,
+        'club': None,
+        'league': None,
+        'about': None
+    }
+
+    paragraphs = meta.find_all("p")
+
+    # Full name is the first paragraph when it is just a <strong> name
+    if paragraphs:
+        first = paragraphs[0]
+        strong = first.find("strong")
+        if strong is not None and ':' not in first.get_text() and strong.get_text().strip():
+            details['other_name'] = strong.get_text().strip()
+
+    birth = meta.select_one('[itemprop="birthDate"]')
+    if birth is not None:
+        details['date_of_birth'] = birth.get('data-birth') or birth.get_text().strip()
+    birth_place = meta.select_one('[itemprop="birthPlace"]')
+    if birth_place is not None:
+        details['place_of_birth'] = birth_place.get_text().strip().removeprefix('in ').strip()
+
+    height = meta.select_one('[itemprop="height"]')
+    if height is not None:
+        details['height'] = height.get_text().strip()
+    weight = meta.select_one('[itemprop="weight"]')
+    if weight is not None:
+        details['weight'] = weight.get_text().strip()
+
+    about = []
+    for paragraph in paragraphs:
+        text = ' '.join(paragraph.get_text(' ').split())
+        if not text:
+            continue
+        about.append(text)
+
+        label = paragraph.find("strong")
+        label = label.get_text().strip().rstrip(':') if label is not None else ''
+        link = paragraph.find("a")
+        value = link.get_text().strip() if link is not None else text.split(':', 1)[-1].strip()
+
+        if label in ('National Team', 'Citizenship') and not details['nationality']:
+            details['nationality'] = value
+        elif label == 'Club':
+            details['club'] = value
+    details['about'] = '\n'.join(about) or None
+
+    # League of the most recent domestic league season
+    league_cells = soup.select('table[id^="stats_standard_dom_lg"] tbody tr td[data-stat="comp_level"]')
+    if league_cells:
+        details['league'] = ' '.join(league_cells[-1].get_text(' ').split()) or None
+
+    return details
+
+
+class HttpFetcher:
+    """
+    Plain HTTP backend: pooled keep-alive session, gzip, parsed with lxml
+
+    With an HttpCache, pages are revalidated with If-None-Match /
+    If-Modified-Since and 304 answers are served from disk; an offline
+    cache never touches the network.
+    """
+
+    name = "http"
+
+    def __init__(self, timeout=30, cache=None):
+        self.timeout = timeout
+        self.cache = cache
+        # Timing of the last load_* call: fetch_seconds, parse_seconds, bytes
+        self.last_timing = {}
+        self.last_bytes = 0
+        self.session = requests.Session()
+        self.session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "text/html,application/xhtml+xml",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive",
+        })
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def check_response(self, url, response):
+        """Raise ThrottledError when the server asks us to slow down, HTTPError on other failures"""
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        if response.status_code == 429 or (response.status_code == 503 and retry_after is not None):
+            raise ThrottledError(url, response.status_code, retry_after)
+        response.raise_for_status()
+
+    def get(self, url, if_changed=False):
+        """
+        Return the page source of url
+
+        Args:
+            url (str): Page to fetch
+            if_changed (bool): Return UNCHANGED instead of the cached page on a 304
+        """
+        self.last_bytes = 0
+        if self.cache is None:
+            response = self.session.get(url, timeout=self.timeout)
+            self.check_response(url, response)
+            self.last_bytes = len(response.content)
+            return response.text
+
+        meta = self.cache.lookup(url)
+        if self.cache.offline:
+            if meta is None:
+                raise CacheMissError(f"{url} is not in the HTTP cache")
+            return self.cache.read_body(url)
+
+        response = self.session.get(
+            url, headers=self.cache.conditional_headers(meta), timeout=self.timeout
+        )
+        if response.status_code == 304 and meta is not None:
+            return UNCHANGED if if_changed else self.cache.read_body(url)
+
+        self.check_response(url, response)
+        self.last_bytes = len(response.content)
+        self.cache.store(
+            url, response.text,
+            etag=response.headers.get('ETag'),
+            last_modified=response.headers.get('Last-Modified')
+        )
+        return response.text
+
+    def load(self, url, parse, if_changed=False):
+        """Fetch url and parse it, recording both timings in last_timing"""
+        started = time.monotonic()
+        html = self.get(url, if_changed)
+        fetched = time.monotonic()
+        result = UNCHANGED if html is UNCHANGED else parse(html)
+        self.last_timing = {
+            'fetch_seconds': fetched - started,
+            'parse_seconds': time.monotonic() - fetched,
+            'bytes': self.last_bytes
+        }
+        return result
+
+    def load_player_codes(self, url, if_changed=False):
+        return self.load(url, lambda html: parse_player_codes(html, url), if_changed)
+
+    def load_player_rows(self, url, if_changed=False):
+        return self.load(url, lambda html: parse_player_rows(html, url), if_changed)
+
+    def load_player_details(self, url):
+        return self.load(url, parse_player_details)
+
+    def close(self):
+        self.session.close()
+
+
+class SeleniumFetcher:
+    """Headless Chrome backend, for pages that need JavaScript"""
+
+    name = "selenium"
+
+    def __init__(self, timeout=30):
+        # Imported here so the HTTP backend runs without Chrome installed
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+        from selenium.webdriver.chrome.options import Options
+        from webdriver_manager.chrome import ChromeDriverManager
+
+        self.timeout = timeout
+        # Timing of the last load_* call: fetch_seconds, parse_seconds, bytes
+        self.last_timing = {}
+
+        # Setup Chrome options with additional stability settings
+        chrome_options = Options()
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        chrome_options.add_argument('--disable-gpu')
+        chrome_options.add_argument('--disable-features=VizDisplayCompositor')
+        chrome_options.add_argument('--disable-extensions')
+        chrome_options.add_argument('--headless')  # Run in headless mode
+
+        self.driver = webdriver.Chrome(
+            service=Service(ChromeDriverManager().install()),
+            options=chrome_options
+        )
+        self.driver.set_page_load_timeout(timeout)
+
+    def get(self, url, wait_class=None):
+        """Navigate to url and wait for the page (or wait_class) to be present"""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+
+        self.driver.get(url)
+
+        if wait_class:
+            locator = (By.CLASS_NAME, wait_class)
+        else:
+            locator = (By.TAG_NAME, "body")
+        WebDriverWait(self.driver, self.timeout).until(
+            EC.presence_of_element_located(locator)
+        )
+
+    def load(self, url, parse, wait_class=None):
+        """Render url and parse one page_source grab, recording timings in last_timing"""
+        started = time.monotonic()
+        self.get(url, wait_class=wait_class)
+        html = self.driver.page_source
+        fetched = time.monotonic()
+        result = parse(html)
+        self.last_timing = {
+            'fetch_seconds': fetched - started,
+            'parse_seconds': time.monotonic() - fetched,
+            'bytes': len(html)
+        }
+        return result
+
+    def load_player_codes(self, url, if_changed=False):
+        # One page_source grab parsed locally instead of an RPC per link
+        codes = self.load(url, lambda html: parse_player_codes(html, url))
+        print(f"Page title: {self.driver.title}")
+        return codes
+
+    def load_player_rows(self, url, if_changed=False):
+        # One page_source grab parsed locally instead of two RPCs per player row
+        return self.load(url, lambda html: parse_player_rows(html, url), wait_class="section_content")
+
+    def load_player_details(self, url):
+        return self.load(url, parse_player_details, wait_class="players")
+
+    def close(self):
+        self.driver.quit()
+
+
+class ThreadFetchers:
+    """
+    One fetcher per worker thread, since fetchers are not thread-safe
+
+    primary() uses the chosen backend (with the shared page cache),
+    fallback() a selenium fetcher for pages that need JavaScript.
+    """
+
+    def __init__(self, backend=None, cache=None):
+        self.backend = backend
+        self.cache = cache
+        self.local = threading.local()
+        self.fetchers = []
+        self.lock = threading.Lock()
+
+    def _get(self, name, backend, cache):
+        fetcher = getattr(self.local, name, None)
+        if fetcher is None:
+            fetcher = get_fetcher(backend, cache=cache)
+            setattr(self.local, name, fetcher)
+            with self.lock:
+                self.fetchers.append(fetcher)
+        return fetcher
+
+    def primary(self):
+        return self._get('primary', self.backend, self.cache)
+
+    def fallback(self):
+        return self._get('fallback', 'selenium', None)
+
+    def close(self):
+        with self.lock:
+            for fetcher in self.fetchers:
+                fetcher.close()
+            self.fetchers = []
+
+
+FETCHERS = {
+    "http": HttpFetcher,
+    "selenium": SeleniumFetcher,
+}
+
+
+def get_fetcher(backend=None, cache=None):
+    """
+    Create a page fetcher
+
+    Args:
+        backend (str): 'http' or 'selenium' (default: FETCH_BACKEND env var, else 'http')
+        cache (HttpCache): Page cache for the HTTP backend, shared by all workers
+
+    Returns:
+        HttpFetcher or SeleniumFetcher
+    """
+    backend = (backend or FETCH_BACKEND).lower()
+    if backend not in FETCHERS:
+        raise ValueError(f"Unknown fetch backend: {backend}")
+    if backend == "http":
+        return HttpFetcher(cache=cache)
+    return FETCHERS[backend]()
@@ -1,74 +1,285 @@
+import json
 import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
 from dotenv import load_dotenv
 import requests
 
+from db import writer_connection
+from services.api_cache import API_CACHE_MODE, ApiCache
+from services.api_quota import QuotaLedger
+from services.rate_limit import HostLimiter, ThrottledError, call_with_retries, parse_retry_after
+
 load_dotenv()  # Load environment variables from .env file
 API_KEY = os.getenv("API_KEY")
 BASE_URL = os.getenv("BASE_URL")
 
+API_CONCURRENCY = int(os.getenv("API_CONCURRENCY", "4"))  # pages in flight during a sync
+API_RATE = float(os.getenv("API_RATE", "2"))              # requests per second
+API_BATCH_ROWS = 500                                      # players per sink transaction
+API_DB = os.getenv("API_DB", "./data/football.db")
+
 HEADERS = {
     "x-apisports-key": API_KEY
 }
 
+session = None
+quota = None
+api_cache = None
+session_lock = threading.Lock()
+
+
+class ApiFootballError(Exception):
+    """The API answered 200 but reported errors in the body"""
+
+
+def get_session():
+    """Shared keep-alive session, with enough pooled connections for API_CONCURRENCY pages"""
+    global session
+    with session_lock:
+        if session is None:
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=max(API_CONCURRENCY, 4))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        return session
+
+
+def get_quota():
+    """Shared quota ledger for the API key"""
+    global quota
+    with session_lock:
+        if quota is None:
+            quota = QuotaLedger()
+        return quota
+
+
+def get_api_cache():
+    """Shared response cache, None when API_CACHE_MODE is off"""
+    global api_cache
+    if API_CACHE_MODE == "off":
+        return None
+    with session_lock:
+        if api_cache is None:
+            api_cache = ApiCache()
+        return api_cache
+
+
+def request_json(endpoint, params=None, timeout=30):
+    """
+    GET an API endpoint and return the decoded body, counting the call in the quota ledger
+
+    Raises QuotaExceededError when the day's budget is spent, ThrottledError
+    on 429 or a rateLimit error in the body (so call_with_retries backs
+    off), ApiFootballError for other body errors and HTTPError for other
+    failed statuses.
+    """
+    url = f"{BASE_URL}{endpoint}"
+    ledger = get_quota()
+    ledger.reserve_request()
+    response = get_session().get(url, params=params, timeout=timeout)
+    ledger.record_response(response.headers)
+    if response.status_code == 429:
+        raise ThrottledError(url, 429, parse_retry_after(response.headers.get('Retry-After')))
+    response.raise_for_status()
+
+    result = response.json()
+    errors = result.get("errors")
+    if errors:
+        if isinstance(errors, dict) and "rateLimit" in errors:
+            raise ThrottledError(url, 429, parse_retry_after(response.headers.get('Retry-After')))
+        raise ApiFootballError(f"{endpoint}: {errors}")
+    return result
+
+
+def get_json(endpoint, params=None, ttl=None, stale_while_revalidate=0, limiter=None, serve_stale_on_error=True):
+    """
+    Decoded body of an API endpoint, from the response cache when it is fresh
+
+    Only cache misses reach the API (and the quota); with a limiter they
+    go through its rate limit and retries.
+
+    Args:
+        endpoint (str): API endpoint, e.g. 'players'
+        params (dict): Query parameters
+        ttl (int): Seconds the response stays fresh (default: API_CACHE_TTL for the endpoint)
+        stale_while_revalidate (int): Seconds past ttl a stale response is served while it is refreshed
+        limiter (HostLimiter): Rate limiter for the upstream call
+        serve_stale_on_error (bool): Fall back to the cached copy when the upstream call fails
+
+    Returns:
+        dict: Decoded response body
+    """
+    def fetch():
+        if limiter is None:
+            return request_json(endpoint, params)
+        return call_with_retries(limiter, f"{BASE_URL}{endpoint}", lambda: request_json(endpoint, params))
+
+    cache = get_api_cache()
+    if cache is None:
+        return fetch()
+    return cache.get(endpoint, params, fetch, ttl=ttl, stale_while_revalidate=stale_while_revalidate,
+                     serve_stale_on_error=serve_stale_on_error)
+
+
 def get_live_matches():
-    response = requests.get(f"{BASE_URL}fixtures?live=all", headers=HEADERS)
-    if response.status_code == 200:
-        return response.json()
-    else:
+    try:
+        # Live scores change every few seconds upstream: serve up to 15s old, refresh in the background up to 45s
+        return get_json("fixtures", params={"live": "all"}, ttl=15, stale_while_revalidate=30)
+    except Exception:
         return {"error": "Failed to fetch live matches"}
 
+def fetch_live_fixtures():
+    """
+    Live fixtures straight from the API (the response is still stored for get_live_matches)
+
+    Used by the live poller, which sets its own pace; raises on failure
+    rather than returning an old cached copy as current scores.
+    """
+    return get_json("fixtures", params={"live": "all"}, ttl=0, serve_stale_on_error=False)
+
 def update_players_data(page=1, per_page=100):
     """
     Fetch and update player data in batches of 100 players per request.
-    
+
     Args:
         page (int): The page number to fetch (default: 1)
         per_page (int): Number of players per page (default: 100)
-    
+
     Returns:
         dict: Response containing player data or error message
     """
-    response = requests.get(
-        f"{BASE_URL}players",
-        headers=HEADERS,
-        params={
-            "page": page,
-            "per_page": per_page
-        }
+    try:
+        return get_json("players", params={"page": page, "per_page": per_page})
+    except requests.HTTPError as e:
+        return {"error": f"Failed to fetch players data. Status code: {e.response.status_code}"}
+    except Exception as e:
+        return {"error": f"Failed to fetch players data: {e}"}
+
+def fetch_players_page(page, per_page, params, limiter):
+    """One page of the players endpoint, from the cache or under the limiter's rate and retries"""
+    return get_json("players", params=dict(params or {}, page=page, per_page=per_page), limiter=limiter)
+
+def iter_players(per_page=100, concurrency=None, params=None, limiter=None):
+    """
+    Stream every player of the players endpoint, page by page
+
+    Page 1 is fetched first to learn paging.total; the other pages are
+    then fetched `concurrency` at a time on the shared session and
+    yielded in page order as they complete, so at most `concurrency`
+    pages are held in memory.
+
+    Args:
+        per_page (int): Players per page
+        concurrency (int): Pages in flight (default: API_CONCURRENCY env var)
+        params (dict): Extra query parameters, e.g. {"league": 39, "season": 2024}
+        limiter (HostLimiter): Shared rate limiter (default: one at API_RATE)
+
+    Returns:
+        generator: Player objects as returned by the API
+    """
+    concurrency = max(1, concurrency or API_CONCURRENCY)
+    limiter = limiter or HostLimiter(rate=API_RATE, max_rate=API_RATE, max_concurrency=concurrency)
+
+    first = fetch_players_page(1, per_page, params, limiter)
+    yield from first.get("response", [])
+    total = first.get("paging", {}).get("total", 1)
+    if total <= 1:
+        return
+    print(f"Fetching {total} pages of players, {concurrency} at a time")
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pages = iter(range(2, total + 1))
+    pending = deque(
+        executor.submit(fetch_players_page, page, per_page, params, limiter) for page in islice(pages, concurrency)
+    )
+    try:
+        while pending:
+            result = pending.popleft().result()
+            # Keep the window full before handing this page to the consumer
+            next_page = next(pages, None)
+            if next_page is not None:
+                pending.append(executor.submit(fetch_players_page, next_page, per_page, params, limiter))
+            yield from result.get("response", [])
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+def create_api_players_table(conn):
+    """Create the api_players table: one row per API player id, with the raw object as JSON"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS api_players (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        firstname TEXT,
+        lastname TEXT,
+        age INTEGER,
+        nationality TEXT,
+        data TEXT,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
     )
-    
-    if response.status_code == 200:
-        return response.json()
-    else:
-        return {"error": f"Failed to fetch players data. Status code: {response.status_code}"}
+    ''')
+    conn.commit()
+
+def save_api_players(players, db_path=None, batch_size=API_BATCH_ROWS):
+    """
+    Upsert a stream of API players into api_players, one transaction per batch
+
+    Args:
+        players (iterable): Player objects ({"player": {...}, "statistics": [...]})
+        db_path (str): SQLite database (default: API_DB env var)
+        batch_size (int): Players per transaction
+
+    Returns:
+        int: Players saved
+    """
+    conn = writer_connection(db_path or API_DB)
+    try:
+        create_api_players_table(conn)
+        saved = 0
+        players = iter(players)
+        while True:
+            batch = list(islice(players, batch_size))
+            if not batch:
+                break
+            rows = [
+                (p["player"]["id"], p["player"].get("name"), p["player"].get("firstname"),
+                 p["player"].get("lastname"), p["player"].get("age"), p["player"].get("nationality"),
+                 json.dumps(p, ensure_ascii=False))
+                for p in batch if p.get("player", {}).get("id") is not None
+            ]
+            conn.executemany("""
+                INSERT INTO api_players (id, name, firstname, lastname, age, nationality, data, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(id) DO UPDATE SET
+                    name = excluded.name,
+                    firstname = excluded.firstname,
+                    lastname = excluded.lastname,
+                    age = excluded.age,
+                    nationality = excluded.nationality,
+                    data = excluded.data,
+                    updated_at = CURRENT_TIMESTAMP
+            """, rows)
+            conn.commit()
+            saved += len(rows)
+            print(f"Saved {saved} players")
+        return saved
+    finally:
+        conn.close()
 
-def update_all_players():
+def update_all_players(db_path=None, per_page=100, concurrency=None, params=None):
     """
-    Update all players data by fetching them in batches of 100.
-    Handles pagination automatically.
+    Sync every player of the API into api_players
+
+    Pages are fetched concurrently and written as they arrive, so memory
+    stays bounded by the pages in flight and one batch.
+
+    Returns:
+        int: Players saved
     """
-    page = 1
-    all_players = []
-    
-    while True:
-        result = update_players_data(page=page)
-        
-        if "error" in result:
-            print(f"Error occurred at page {page}: {result['error']}")
-            break
-            
-        players = result.get("response", [])
-        if not players:  # No more players to fetch
-            break
-            
-        all_players.extend(players)
-        print(f"Fetched {len(players)} players from page {page}")
-        
-        # Check if we've reached the last page
-        paging = result.get("paging", {})
-        if page >= paging.get("total", page):
-            break
-            
-        page += 1
-    
-    return all_players
\ No newline at end of file
+    return save_api_players(iter_players(per_page=per_page, concurrency=concurrency, params=params), db_path)
@@ -0,0 +1,136 @@
+### On-disk HTTP cache for crawled pages ###
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", "cache/http")
+HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", "512"))
+HTTP_CACHE_MODE = os.getenv("HTTP_CACHE_MODE", "on")  # on, off or offline
+
+CACHE_MODES = ("on", "off", "offline")
+
+
+class CacheMissError(Exception):
+    """Raised in offline mode when a page is not in the cache"""
+
+
+class HttpCache:
+    """
+    Gzipped page bodies on disk with their ETag/Last-Modified validators
+
+    Each url is stored as <sha1>.json (validators, size) next to
+    <sha1>.html.gz. The total size of the bodies is capped; entries are
+    evicted least recently used first, using the metadata file's mtime
+    as the access time.
+    """
+
+    def __init__(self, directory=HTTP_CACHE_DIR, max_mb=HTTP_CACHE_MAX_MB, offline=False):
+        self.directory = directory
+        self.max_bytes = max_mb * 1024 * 1024
+        self.offline = offline
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(
+            os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory) if name.endswith('.html.gz')
+        )
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode()).hexdigest()
+        base = os.path.join(self.directory, key)
+        return base + '.json', base + '.html.gz'
+
+    def lookup(self, url):
+        """Return the stored metadata for url (and mark it used), or None"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not os.path.exists(body_path):
+            return None
+
+        os.utime(meta_path)
+        return meta
+
+    def conditional_headers(self, meta):
+        """Request headers that let the server answer 304 for a cached entry"""
+        headers = {}
+        if meta and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def read_body(self, url):
+        _, body_path = self._paths(url)
+        with open(body_path, 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8')
+
+    def store(self, url, text, etag=None, last_modified=None):
+        meta_path, body_path = self._paths(url)
+        body = gzip.compress(text.encode('utf-8'))
+        meta = {
+            'url': url,
+            'etag': etag,
+            'last_modified': last_modified,
+            'stored_at': time.time(),
+            'size': len(body)
+        }
+
+        with self.lock:
+            old_size = os.path.getsize(body_path) if os.path.exists(body_path) else 0
+
+            # Write to temp files first so a killed run never leaves half an entry
+            with open(body_path + '.tmp', 'wb') as f:
+                f.write(body)
+            with open(meta_path + '.tmp', 'w') as f:
+                json.dump(meta, f)
+            os.replace(body_path + '.tmp', body_path)
+            os.replace(meta_path + '.tmp', meta_path)
+
+            self.size += len(body) - old_size
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is 90% of its cap"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                meta_path = os.path.join(self.directory, name)
+                entries.append((os.path.getmtime(meta_path), meta_path))
+        entries.sort()
+
+        target = self.max_bytes * 0.9
+        for _, meta_path in entries:
+            if self.size <= target:
+                break
+            body_path = meta_path[:-len('.json')] + '.html.gz'
+            if os.path.exists(body_path):
+                self.size -= os.path.getsize(body_path)
+                os.remove(body_path)
+            os.remove(meta_path)
+
+
+def get_http_cache(mode=None):
+    """
+    Create the page cache for a crawl
+
+    Args:
+        mode (str): 'on', 'off' or 'offline' (default: HTTP_CACHE_MODE env var)
+
+    Returns:
+        HttpCache or None when caching is off
+    """
+    mode = (mode or HTTP_CACHE_MODE).lower()
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown HTTP cache mode: {mode}")
+    if mode == "off":
+        return None
+    return HttpCache(offline=(mode == "offline"))
@@ -0,0 +1,200 @@
+### Background poller for live fixtures, pushing per-fixture changes to subscribers ###
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+LIVE_MIN_INTERVAL = float(os.getenv("LIVE_MIN_INTERVAL", "15"))     # while scores are changing
+LIVE_MAX_INTERVAL = float(os.getenv("LIVE_MAX_INTERVAL", "60"))     # live fixtures, nothing changing
+LIVE_IDLE_INTERVAL = float(os.getenv("LIVE_IDLE_INTERVAL", "300"))  # no fixture live at all
+LIVE_KEEPALIVE = 15.0        # seconds between SSE comments on a quiet stream
+SUBSCRIBER_QUEUE_SIZE = 100  # pending events before a slow subscriber is resynced
+
+
+def fixture_id(item):
+    return item.get("fixture", {}).get("id")
+
+
+def diff_fixtures(old, new):
+    """
+    Changes between two snapshots of live fixtures
+
+    Args:
+        old (dict): {fixture id: fixture object}
+        new (dict): {fixture id: fixture object}
+
+    Returns:
+        list: {"type": "added", "id", "fixture"}, {"type": "updated", "id",
+            "changes": {section: new value}} for the top-level sections
+            (fixture, goals, score, events, ...) that differ, and
+            {"type": "removed", "id"}
+    """
+    changes = []
+    for key, item in new.items():
+        before = old.get(key)
+        if before is None:
+            changes.append({"type": "added", "id": key, "fixture": item})
+            continue
+        sections = {section: value for section, value in item.items() if before.get(section) != value}
+        if sections:
+            changes.append({"type": "updated", "id": key, "changes": sections})
+    for key in old.keys() - new.keys():
+        changes.append({"type": "removed", "id": key})
+    return changes
+
+
+def sse_event(event, data, event_id=None):
+    """One Server-Sent Events message"""
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+    return "\n".join(lines) + "\n\n"
+
+
+class LivePoller:
+    """
+    One upstream poll loop for live fixtures, shared by every client
+
+    The latest snapshot is kept in memory and each poll is diffed against
+    it; only the changed fixtures are pushed to subscribers, so upstream
+    traffic does not depend on how many clients are connected. The
+    interval adapts: LIVE_MIN_INTERVAL while scores change, growing to
+    LIVE_MAX_INTERVAL while they don't, LIVE_IDLE_INTERVAL when nothing is
+    live, and never faster than the remaining daily quota allows.
+
+    Runs as an asyncio task on the app's event loop; the blocking fetch
+    runs in a worker thread.
+    """
+
+    def __init__(self, fetch, quota=None, min_interval=LIVE_MIN_INTERVAL, max_interval=LIVE_MAX_INTERVAL,
+                 idle_interval=LIVE_IDLE_INTERVAL):
+        self.fetch = fetch
+        self.quota = quota
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.idle_interval = idle_interval
+        self.interval = min_interval
+        self.fixtures = {}
+        self.version = 0
+        self.updated_at = None
+        self.polled_at = None  # monotonic time of the last upstream call, successful or not
+        self.polls = 0
+        self.errors = 0
+        self.subscribers = set()
+        self.task = None
+        self.wakeup = None
+
+    def snapshot(self):
+        return {
+            "version": self.version,
+            "updated_at": self.updated_at,
+            "interval": self.interval,
+            "fixtures": list(self.fixtures.values())
+        }
+
+    def start(self):
+        if self.task is None:
+            self.wakeup = asyncio.Event()
+            self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def quota_interval(self):
+        """Seconds between polls that spreads the remaining daily quota to 00:00 UTC"""
+        if self.quota is None:
+            return 0.0
+        remaining = self.quota.usage()['remaining']
+        now = datetime.now(timezone.utc)
+        seconds_left = 86400 - (now.hour * 3600 + now.minute * 60 + now.second)
+        return seconds_left / max(remaining, 1)
+
+    async def run(self):
+        while True:
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                self.interval = min(self.max_interval, self.interval * 2)
+                print(f"Error polling live fixtures: {e}")
+
+            # A subscriber arriving while idle may cut the idle wait short (see stream)
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=max(self.interval, self.quota_interval()))
+            except asyncio.TimeoutError:
+                pass
+
+    def poll_due(self):
+        """True when another upstream call is allowed now by min_interval and the quota pace"""
+        if self.polled_at is None:
+            return True
+        return time.monotonic() - self.polled_at >= max(self.min_interval, self.quota_interval())
+
+    async def poll(self):
+        self.polled_at = time.monotonic()
+        result = await asyncio.to_thread(self.fetch)
+        self.polls += 1
+        if "error" in result:
+            raise RuntimeError(result["error"])
+
+        fixtures = {fixture_id(item): item for item in result.get("response", []) if fixture_id(item) is not None}
+        changes = diff_fixtures(self.fixtures, fixtures)
+        self.fixtures = fixtures
+        self.updated_at = time.time()
+
+        if not fixtures:
+            self.interval = self.idle_interval
+        elif changes:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+
+        if changes:
+            self.version += 1
+            self.publish({"version": self.version, "changes": changes})
+
+    def publish(self, message):
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(("changes", message))
+            except asyncio.QueueFull:
+                # Too far behind to catch up change by change: replace its backlog with the full state
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("snapshot", self.snapshot()))
+
+    async def stream(self):
+        """
+        Server-Sent Events for one client: the current snapshot, then every change as it is polled
+
+        Returns:
+            async generator: SSE messages (str)
+        """
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        # While idle, a first client may bring the next poll forward, but only once it is due anyway:
+        # reconnecting clients must not cost upstream calls or outrun the quota
+        if self.interval >= self.idle_interval and self.wakeup is not None and self.poll_due():
+            self.wakeup.set()
+        try:
+            yield sse_event("snapshot", self.snapshot(), self.version)
+            while True:
+                try:
+                    event, message = await asyncio.wait_for(queue.get(), timeout=LIVE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield sse_event(event, message, message["version"])
+        finally:
+            self.subscribers.discard(queue)
@@ -0,0 +1,283 @@
+### Rate limiting, backoff and retries for crawlers ###
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+CRAWL_RATE = float(os.getenv("CRAWL_RATE", "0.5"))          # starting requests per second per host
+CRAWL_MAX_RATE = float(os.getenv("CRAWL_MAX_RATE", "1.0"))  # ceiling while the site stays healthy
+CRAWL_MIN_RATE = 0.05
+
+BACKOFF_BASE = 2.0
+BACKOFF_MAX = 120.0
+BREAKER_THRESHOLD = 5       # consecutive refusals before the circuit opens
+BREAKER_COOLDOWN = 300.0    # seconds the circuit stays open
+
+# Failure kinds that are worth another attempt
+RETRYABLE = ("throttled", "timeout", "connection", "server")
+
+
+class ThrottledError(Exception):
+    """The server asked us to slow down (429, or 503 with Retry-After)"""
+
+    def __init__(self, url, status_code, retry_after=None):
+        super().__init__(f"{status_code} from {url}" + (f", retry after {retry_after:.0f}s" if retry_after else ""))
+        self.url = url
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """The host refused too many requests in a row; not calling it until the cooldown ends"""
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def classify_error(error):
+    """
+    Sort a fetch error into a failure kind
+
+    Returns:
+        str: 'throttled', 'refused', 'timeout', 'connection', 'server', 'client' or 'parse'
+    """
+    if isinstance(error, ThrottledError):
+        return "throttled"
+    if isinstance(error, CircuitOpenError):
+        return "refused"
+
+    status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status_code is not None:
+        if status_code == 403:
+            return "refused"
+        if status_code >= 500:
+            return "server"
+        return "client"
+
+    name = type(error).__name__
+    if "Timeout" in name:
+        return "timeout"
+    if "Connection" in name or isinstance(error, OSError):
+        return "connection"
+    return "parse"
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Exponential backoff with full jitter for the given attempt (1-based)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """
+    Adaptive token bucket
+
+    Refills at `rate` tokens per second up to `capacity`. The rate grows
+    additively after successes up to max_rate and halves when the server
+    throttles (AIMD), so the crawl settles at what the site tolerates.
+    """
+
+    def __init__(self, rate=CRAWL_RATE, max_rate=CRAWL_MAX_RATE, capacity=1.0, increase=0.02):
+        self.rate = rate
+        self.max_rate = max(rate, max_rate)
+        self.capacity = capacity
+        self.increase = increase
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def speed_up(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def slow_down(self):
+        with self.lock:
+            self.rate = max(CRAWL_MIN_RATE, self.rate / 2)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive refusals and rejects calls for
+    `cooldown` seconds; then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def is_open(self):
+        with self.lock:
+            return self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_running:
+                raise CircuitOpenError("Circuit open: host is refusing requests")
+            self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_other_failure(self):
+        """A failure that says nothing about the host refusing us, e.g. a parse error"""
+        with self.lock:
+            self.trial_running = False
+
+    def record_refusal(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class HostLimiter:
+    """
+    Politeness, backoff and circuit breaking per host, shared by all workers
+
+    Each host gets a token bucket (request rate), a semaphore
+    (max_concurrency requests in flight), a circuit breaker and a pause
+    set from Retry-After that holds every worker back.
+    """
+
+    def __init__(self, rate=CRAWL_RATE, max_rate=CRAWL_MAX_RATE, max_concurrency=1):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.max_concurrency = max(1, max_concurrency)
+        self.lock = threading.Lock()
+        self.hosts = {}
+
+    def host_state(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = {
+                    'bucket': TokenBucket(rate=self.rate, max_rate=self.max_rate),
+                    'semaphore': threading.BoundedSemaphore(self.max_concurrency),
+                    'breaker': CircuitBreaker(),
+                    'paused_until': 0.0
+                }
+            return self.hosts[host]
+
+    def circuit_open(self, url=None):
+        """True if the host of url (or, without url, any host) is refusing requests"""
+        if url is not None:
+            return self.host_state(url)['breaker'].is_open()
+        with self.lock:
+            states = list(self.hosts.values())
+        return any(state['breaker'].is_open() for state in states)
+
+    def current_rate(self, url):
+        return self.host_state(url)['bucket'].rate
+
+    @contextmanager
+    def limit(self, url):
+        """Hold a request slot for the host of url"""
+        state = self.host_state(url)
+        state['breaker'].before_call()
+
+        state['semaphore'].acquire()
+        try:
+            pause = state['paused_until'] - time.monotonic()
+            if pause > 0:
+                time.sleep(pause)
+            state['bucket'].acquire()
+            yield
+        finally:
+            state['semaphore'].release()
+
+    def record_success(self, url):
+        state = self.host_state(url)
+        state['bucket'].speed_up()
+        state['breaker'].record_success()
+
+    def record_error(self, url, kind, retry_after=None):
+        state = self.host_state(url)
+        if kind == "throttled":
+            state['bucket'].slow_down()
+            if retry_after:
+                with self.lock:
+                    state['paused_until'] = max(state['paused_until'], time.monotonic() + retry_after)
+        if kind in ("throttled", "refused", "connection"):
+            state['breaker'].record_refusal()
+        else:
+            state['breaker'].record_other_failure()
+
+
+def call_with_retries(limiter, url, fetch, max_attempts=3, on_attempt=None, on_error=None):
+    """
+    Call fetch() under the host limits of url, retrying what is worth retrying
+
+    Throttling, timeouts, connection and 5xx errors are retried with
+    exponential backoff and jitter (at least Retry-After when given);
+    parse errors, other 4xx and an open circuit fail straight away.
+
+    Args:
+        limiter (HostLimiter): Shared limiter
+        url (str): Page being fetched, used to pick the host
+        fetch (callable): Does the request and returns its result
+        max_attempts (int): Attempts before giving up
+        on_attempt (callable): on_attempt(attempt) before every attempt
+        on_error (callable): on_error(attempt, kind, error) after every failure
+
+    Returns:
+        Whatever fetch() returns
+    """
+    for attempt in range(1, max_attempts + 1):
+        if on_attempt:
+            on_attempt(attempt)
+        try:
+            with limiter.limit(url):
+                result = fetch()
+            limiter.record_success(url)
+            return result
+
+        except Exception as e:
+            kind = classify_error(e)
+            retry_after = getattr(e, 'retry_after', None)
+            if not isinstance(e, CircuitOpenError):
+                limiter.record_error(url, kind, retry_after)
+            if on_error:
+                on_error(attempt, kind, e)
+            if kind not in RETRYABLE or attempt == max_attempts:
+                raise e
+
+            delay = backoff_delay(attempt)
+            if retry_after:
+                delay = max(delay, retry_after)
+            time.sleep(delay)
@@ -0,0 +1,251 @@
+### Columnar snapshot of the players table for analytics ###
+import json
+import os
+import time
+
+from db import read_connection
+from player_queries import EXPORT_COLUMNS, iter_players
+
+# pyarrow is optional: without it the loaders simply skip the snapshot
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "data/snapshot")
+SNAPSHOT_MODE = os.getenv("SNAPSHOT_MODE", "on")  # on or off
+
+PARQUET_FILE = "players.parquet"
+ARROW_FILE = "players.arrow"
+META_FILE = "snapshot.json"
+
+# Low-cardinality columns stored as dictionary (integer codes + one copy of each value)
+DICTIONARY_COLUMNS = ('position', 'nationality', 'letter')
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("pyarrow is required for the columnar snapshot (pip install pyarrow)")
+
+
+def snapshot_schema():
+    types = {'id': pa.int64(), 'player_code_id': pa.int32(), 'date_of_birth': pa.date32(),
+             'updated_at': pa.timestamp('s')}
+    return pa.schema([
+        (column, pa.dictionary(pa.int32(), pa.string()) if column in DICTIONARY_COLUMNS
+         else types.get(column, pa.string()))
+        for column in EXPORT_COLUMNS
+    ])
+
+
+def read_data_version(db_path):
+    """Data version of db_path, 0 before the first load"""
+    # A private connection, closed here: the loader's writer must be able to checkpoint
+    conn = read_connection(db_path)
+    try:
+        row = conn.execute("SELECT value FROM data_meta WHERE key = 'data_version'").fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else 0
+
+
+def read_meta(directory=None):
+    try:
+        with open(os.path.join(directory or SNAPSHOT_DIR, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_table(db_path):
+    """Read players chunk by chunk into an Arrow table in the snapshot schema"""
+    # Column types as they come out of SQLite; everything but the ids is text
+    plain_schema = pa.schema([
+        (column, {'id': pa.int64(), 'player_code_id': pa.int32()}.get(column, pa.string()))
+        for column in EXPORT_COLUMNS
+    ])
+
+    batches = []
+    for rows in iter_players(db_path=db_path):
+        columns = list(zip(*rows))
+        batches.append(pa.record_batch(
+            [pa.array(values, type=field.type) for values, field in zip(columns, plain_schema)],
+            schema=plain_schema
+        ))
+    table = pa.Table.from_batches(batches, schema=plain_schema).combine_chunks()
+
+    # One dictionary per column over the whole table, typed dates for range scans
+    for column in DICTIONARY_COLUMNS:
+        index = table.schema.get_field_index(column)
+        table = table.set_column(index, column, pc.dictionary_encode(table.column(column)))
+    dates = pc.strptime(table.column('date_of_birth'), format='%Y-%m-%d', unit='s', error_is_null=True)
+    table = table.set_column(table.schema.get_field_index('date_of_birth'), 'date_of_birth',
+                             pc.cast(dates, pa.date32()))
+    updated = pc.strptime(table.column('updated_at'), format='%Y-%m-%d %H:%M:%S', unit='s', error_is_null=True)
+    table = table.set_column(table.schema.get_field_index('updated_at'), 'updated_at', updated)
+    return table.cast(snapshot_schema())
+
+
+def write_arrow(table, path):
+    """Write table as an uncompressed Arrow IPC file, moved into place when complete"""
+    table = table.unify_dictionaries()
+    with pa.OSFile(path + '.tmp', 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=64 * 1024)
+    os.replace(path + '.tmp', path)
+
+
+def write_snapshot(db_path, directory=None, force=False):
+    """
+    Publish players as Parquet (for storage and other tools) and as an
+    uncompressed Arrow IPC file (memory-mapped by open_snapshot)
+
+    Files are written next to their final name and moved into place, the
+    metadata last, so readers never see a half-written snapshot. Nothing is
+    written when the data version is the one already published.
+
+    Args:
+        db_path (str): SQLite database
+        directory (str): Output directory (default: SNAPSHOT_DIR env var)
+        force (bool): Write even if the data version is unchanged
+
+    Returns:
+        dict or None: Snapshot metadata, None when it was already current
+    """
+    require_pyarrow()
+    directory = directory or SNAPSHOT_DIR
+    data_version = read_data_version(db_path)
+    meta = read_meta(directory)
+    if not force and meta is not None and meta.get('data_version') == data_version:
+        return None
+
+    started = time.monotonic()
+    table = build_table(db_path)
+    os.makedirs(directory, exist_ok=True)
+
+    parquet_path = os.path.join(directory, PARQUET_FILE)
+    pq.write_table(table, parquet_path + '.tmp', compression='zstd', use_dictionary=list(DICTIONARY_COLUMNS))
+    os.replace(parquet_path + '.tmp', parquet_path)
+    arrow_path = os.path.join(directory, ARROW_FILE)
+    write_arrow(table, arrow_path)
+
+    meta = {
+        'data_version': data_version,
+        'rows': table.num_rows,
+        'columns': table.schema.names,
+        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'seconds': round(time.monotonic() - started, 3),
+        'parquet_bytes': os.path.getsize(parquet_path),
+        'arrow_bytes': os.path.getsize(arrow_path)
+    }
+    with open(os.path.join(directory, META_FILE + '.tmp'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(os.path.join(directory, META_FILE + '.tmp'), os.path.join(directory, META_FILE))
+    return meta
+
+
+def open_snapshot(columns=None, directory=None):
+    """
+    Memory-map the Arrow snapshot
+
+    Columns are not copied or converted: the table points straight into
+    the mapped file, and pages are read from disk only when touched.
+
+    Args:
+        columns (list): Columns to keep (default: all)
+        directory (str): Snapshot directory (default: SNAPSHOT_DIR env var)
+
+    Returns:
+        pyarrow.Table
+    """
+    require_pyarrow()
+    directory = directory or SNAPSHOT_DIR
+    arrow_path = os.path.join(directory, ARROW_FILE)
+    if not os.path.exists(arrow_path):
+        # Only the Parquet file is committed; build the mappable copy on first use
+        write_arrow(pq.read_table(os.path.join(directory, PARQUET_FILE)), arrow_path)
+
+    source = pa.memory_map(arrow_path, 'r')
+    table = pa.ipc.open_file(source).read_all()
+    return table.select(columns) if columns else table
+
+
+def dictionary_mask(column, predicate):
+    """Row mask for a dictionary column, evaluating predicate once per distinct value instead of per row"""
+    masks = []
+    for chunk in column.chunks:
+        matching = pc.cast(pc.indices_nonzero(predicate(chunk.dictionary)), chunk.indices.type)
+        masks.append(pc.is_in(chunk.indices, value_set=matching))
+    return pa.chunked_array(masks, type=pa.bool_())
+
+
+def scan_players(columns=None, letter=None, position=None, nationality=None, born_from=None, born_to=None,
+                 directory=None):
+    """
+    Filter the snapshot the way analysts usually slice it
+
+    Args:
+        columns (list): Columns to return (default: all)
+        letter (str): Letter code, e.g. 'Ab'
+        position (str): Position code; matches 'FW' in 'MF-FW'
+        nationality (str): Exact nationality
+        born_from (str): Earliest date of birth, 'YYYY-MM-DD'
+        born_to (str): Latest date of birth, 'YYYY-MM-DD'
+        directory (str): Snapshot directory (default: SNAPSHOT_DIR env var)
+
+    Returns:
+        pyarrow.Table (call .to_pandas() for a DataFrame)
+    """
+    table = open_snapshot(directory=directory)
+    masks = []
+    if letter:
+        masks.append(dictionary_mask(table.column('letter'), lambda values: pc.equal(values, letter)))
+    if position:
+        pattern = f"(^|-){position.upper()}(-|$)"
+        masks.append(dictionary_mask(table.column('position'),
+                                     lambda values: pc.match_substring_regex(values, pattern)))
+    if nationality:
+        masks.append(dictionary_mask(table.column('nationality'), lambda values: pc.equal(values, nationality)))
+    if born_from:
+        masks.append(pc.greater_equal(table.column('date_of_birth'), pa.scalar(born_from).cast(pa.date32())))
+    if born_to:
+        masks.append(pc.less_equal(table.column('date_of_birth'), pa.scalar(born_to).cast(pa.date32())))
+
+    if masks:
+        combined = masks[0]
+        for mask in masks[1:]:
+            combined = pc.and_(combined, mask)
+        table = table.filter(combined)
+    return table.select(columns) if columns else table
+
+
+def count_by(column, directory=None):
+    """
+    Number of players per value of column, most common first
+
+    Returns:
+        list: [(value, count), ...]
+    """
+    table = open_snapshot([column], directory=directory)
+    counts = table.group_by(column).aggregate([([], 'count_all')])
+    rows = zip(counts.column(column).to_pylist(), counts.column('count_all').to_pylist())
+    return sorted(rows, key=lambda row: row[1], reverse=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write or inspect the columnar players snapshot")
+    parser.add_argument('--db', default="./data/football.db", help="SQLite database path")
+    parser.add_argument('--force', action='store_true', help="Rewrite even if the data version is unchanged")
+    parser.add_argument('--count-by', help="Print player counts per value of this column instead")
+    args = parser.parse_args()
+
+    if args.count_by:
+        for value, count in count_by(args.count_by)[:30]:
+            print(f"{count:>8}  {value}")
+    else:
+        meta = write_snapshot(args.db, force=args.force)
+        print(json.dumps(meta, indent=2) if meta else "Snapshot already matches the current data version")
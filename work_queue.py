@@ -0,0 +1,202 @@
+import os
+import socket
+import threading
+import time
+import uuid
+
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 5
+
+
+def new_worker_id():
+    """Unique id for one crawler process"""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def create_work_queue(cursor):
+    """
+    Create the crawl_queue table
+
+    One row per letter code. state is 'pending', 'leased', 'done' or
+    'failed'; a leased row belongs to lease_owner until lease_expires_at,
+    after which any worker may claim it again.
+    """
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS crawl_queue (
+        player_code_id INTEGER PRIMARY KEY,
+        state TEXT NOT NULL DEFAULT 'pending',
+        lease_owner TEXT,
+        lease_expires_at REAL,
+        heartbeat_at REAL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_retry_at REAL NOT NULL DEFAULT 0,
+        last_error TEXT,
+        updated_at REAL,
+        FOREIGN KEY (player_code_id) REFERENCES player_codes(id)
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_crawl_queue_state ON crawl_queue(state, next_retry_at)")
+
+
+def enqueue_pending_letters(conn):
+    """Queue every letter whose player_codes.status is still 0"""
+    cursor = conn.cursor()
+    create_work_queue(cursor)
+    now = time.time()
+
+    cursor.execute("""
+        INSERT OR IGNORE INTO crawl_queue (player_code_id, state, updated_at)
+        SELECT id, 'pending', ? FROM player_codes WHERE status = 0
+    """, (now,))
+    # Letters finished in an earlier run but reset since then
+    cursor.execute("""
+        UPDATE crawl_queue
+        SET state = 'pending', attempts = 0, next_retry_at = 0, last_error = NULL, updated_at = ?
+        WHERE state = 'done'
+        AND player_code_id IN (SELECT id FROM player_codes WHERE status = 0)
+    """, (now,))
+    conn.commit()
+
+
+def reset_work_queue(cursor):
+    """Put every letter back to pending, including failed ones"""
+    create_work_queue(cursor)
+    cursor.execute("""
+        UPDATE crawl_queue
+        SET state = 'pending', lease_owner = NULL, lease_expires_at = NULL,
+            attempts = 0, next_retry_at = 0, last_error = NULL, updated_at = ?
+    """, (time.time(),))
+
+
+def claim_letters(conn, worker_id, limit, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+    """
+    Lease up to `limit` letters for this worker
+
+    Takes pending letters that are due for a (re)try and letters whose
+    lease has expired (their worker died). An expired letter that already
+    used max_attempts is parked as 'failed' instead, like fail_letter does,
+    so a page that kills its worker is not reclaimed forever. The select
+    and the update run in one IMMEDIATE transaction, so concurrent workers
+    never claim the same letter.
+
+    Returns:
+        list: [{'id', 'letter', 'url', 'attempts'}, ...]
+    """
+    if limit <= 0:
+        return []
+
+    now = time.time()
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("""
+            UPDATE crawl_queue
+            SET state = 'failed', lease_owner = NULL, lease_expires_at = NULL,
+                last_error = 'Lease expired ' || attempts || ' times (worker died)', updated_at = ?
+            WHERE state = 'leased' AND lease_expires_at < ? AND attempts >= ?
+        """, (now, now, max_attempts))
+
+        cursor.execute("""
+            SELECT pc.id, pc.letter, pc.url, q.attempts
+            FROM crawl_queue q
+            JOIN player_codes pc ON pc.id = q.player_code_id
+            WHERE (q.state = 'pending' AND q.next_retry_at <= ?)
+            OR (q.state = 'leased' AND q.lease_expires_at < ?)
+            ORDER BY q.next_retry_at, pc.id
+            LIMIT ?
+        """, (now, now, limit))
+        claimed = [
+            {'id': row[0], 'letter': row[1], 'url': row[2], 'attempts': row[3] + 1}
+            for row in cursor.fetchall()
+        ]
+
+        cursor.executemany("""
+            UPDATE crawl_queue
+            SET state = 'leased', lease_owner = ?, lease_expires_at = ?, heartbeat_at = ?,
+                attempts = attempts + 1, updated_at = ?
+            WHERE player_code_id = ?
+        """, [(worker_id, now + lease_seconds, now, now, row['id']) for row in claimed])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return claimed
+
+
+def complete_letter(cursor, worker_id, player_code_id):
+    """Mark a leased letter done; call inside the transaction that saves its players"""
+    cursor.execute("""
+        UPDATE crawl_queue
+        SET state = 'done', lease_owner = NULL, lease_expires_at = NULL,
+            last_error = NULL, updated_at = ?
+        WHERE player_code_id = ? AND lease_owner = ?
+    """, (time.time(), player_code_id, worker_id))
+
+
+def fail_letter(conn, worker_id, player_code_id, error, max_attempts=MAX_ATTEMPTS):
+    """
+    Release a letter after a failed attempt
+
+    It is retried with exponential backoff (1 min, 2 min, 4 min, ... capped
+    at an hour) until max_attempts, then parked as 'failed'.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT attempts FROM crawl_queue WHERE player_code_id = ?", (player_code_id,))
+    row = cursor.fetchone()
+    attempts = row[0] if row else max_attempts
+
+    now = time.time()
+    state = 'failed' if attempts >= max_attempts else 'pending'
+    next_retry_at = now + min(3600, 60 * 2 ** max(0, attempts - 1))
+
+    cursor.execute("""
+        UPDATE crawl_queue
+        SET state = ?, lease_owner = NULL, lease_expires_at = NULL,
+            next_retry_at = ?, last_error = ?, updated_at = ?
+        WHERE player_code_id = ? AND lease_owner = ?
+    """, (state, next_retry_at, str(error)[:500], now, player_code_id, worker_id))
+    conn.commit()
+    return state
+
+
+class LeaseHeartbeat:
+    """
+    Background thread that keeps this worker's leases alive
+
+    Runs on its own connection and extends every lease held by worker_id
+    each `interval` seconds, so only a dead worker's letters expire.
+    """
+
+    def __init__(self, connect, worker_id, lease_seconds=LEASE_SECONDS, interval=None):
+        self.connect = connect
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.interval = interval or lease_seconds / 5
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="lease-heartbeat", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def run(self):
+        conn = self.connect()
+        try:
+            while not self.stop_event.wait(self.interval):
+                now = time.time()
+                try:
+                    conn.execute("""
+                        UPDATE crawl_queue
+                        SET lease_expires_at = ?, heartbeat_at = ?
+                        WHERE lease_owner = ? AND state = 'leased'
+                    """, (now + self.lease_seconds, now, self.worker_id))
+                    conn.commit()
+                except Exception as e:
+                    print(f"Lease heartbeat error: {str(e)[:100]}")
+        finally:
+            conn.close()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()